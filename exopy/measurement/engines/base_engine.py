@@ -47,6 +47,11 @@ class ExecutionInfos(Atom):
     #: Errors which occured during the execution of the task if any.
     errors = Dict()
 
+    #: Results of the execution : final values of the database entries (dict
+    #: stored under 'database') and optional informations (ex: timings of the
+    #: tasks).
+    results = Dict()
+
 
 class BaseEngine(Atom):
     """Base class for all engines.
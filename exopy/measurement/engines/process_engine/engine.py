@@ -15,12 +15,12 @@ from threading import Thread
 from threading import Event as tEvent
 from pprint import pformat
 
-from atom.api import Typed, Value, Bool
+from atom.api import Typed, Value, Bool, Float, Int
 
 from ....utils.traceback import format_exc
 from ....app.log.tools import QueueLoggerThread
 from ..base_engine import BaseEngine
-from ..utils import ThreadMeasureMonitor
+from ..utils import ThreadMeasureMonitor, SharedArrayRing
 from .subprocess import TaskProcess
 
 logger = logging.getLogger(__name__)
@@ -30,6 +30,18 @@ class ProcessEngine(BaseEngine):
     """An engine executing the tasks it is sent in a different process.
 
     """
+    #: Number of batches of updates of the monitored entries sent per second
+    #: by the subprocess (at most).
+    monitor_rate = Float(20.0)
+
+    #: Size in bytes of the shared memory ring used to transfer large arrays
+    #: to the monitors. Use 0 to send all values through the monitor queue.
+    monitor_ring_size = Int(2**26)
+
+    #: Number of built task hierarchies kept by the subprocess to be reused
+    #: when the same measurement is performed again. Use 0 to rebuild the
+    #: tasks for each measurement. Changes apply when the subprocess restarts.
+    tree_cache_size = Int(0)
 
     def perform(self, exec_infos):
         """Execute a given task.
@@ -58,6 +70,7 @@ class ProcessEngine(BaseEngine):
         self._task_pause.clear()
         self._task_paused.clear()
         self._task_resumed.clear()
+        self._task_resume.clear()
         self._task_stop.clear()
         self._force_stop.clear()
         self._stop_requested = False
@@ -67,6 +80,11 @@ class ProcessEngine(BaseEngine):
 
             self._process_stop.clear()
 
+            # Create the ring used to transfer large arrays to the monitors.
+            self._release_ring()
+            if self.monitor_ring_size > 0:
+                self._ring = SharedArrayRing(self.monitor_ring_size)
+
             # Create the subprocess and the pipe.
             self._pipe, process_pipe = Pipe()
             self._process = TaskProcess(process_pipe,
@@ -75,8 +93,12 @@ class ProcessEngine(BaseEngine):
                                         self._task_pause,
                                         self._task_paused,
                                         self._task_resumed,
+                                        self._task_resume,
                                         self._task_stop,
-                                        self._process_stop)
+                                        self._process_stop,
+                                        self.monitor_rate,
+                                        self._ring,
+                                        self.tree_cache_size)
             self._process.daemon = True
 
             # Create the logger thread in charge of dispatching log reports.
@@ -87,7 +109,8 @@ class ProcessEngine(BaseEngine):
 
             # Create the monitor thread dispatching engine news to the monitor.
             self._monitor_thread = ThreadMeasureMonitor(self,
-                                                        self._monitor_queue)
+                                                        self._monitor_queue,
+                                                        self._ring)
             self._monitor_thread.daemon = True
             logger.debug('Starting monitoring thread.')
             self._monitor_thread.start()
@@ -155,11 +178,12 @@ class ProcessEngine(BaseEngine):
                 return exec_infos
 
         # Here get message from process and react
-        result, errors = self._pipe.recv()
+        result, errors, results = self._pipe.recv()
         logger.debug('Subprocess done performing measurement')
 
         exec_infos.success = result
         exec_infos.errors.update(errors)
+        exec_infos.results.update(results)
 
         self.status = 'Waiting'
 
@@ -170,6 +194,7 @@ class ProcessEngine(BaseEngine):
 
         """
         self.status = 'Pausing'
+        self._task_resume.clear()
         self._task_resumed.clear()
         self._task_paused.clear()
         self._task_pause.set()
@@ -183,6 +208,7 @@ class ProcessEngine(BaseEngine):
         """
         self.status = 'Resuming'
         self._task_pause.clear()
+        self._task_resume.set()
 
     def stop(self, force=False):
         """Ask the engine to stop the current job.
@@ -201,6 +227,8 @@ class ProcessEngine(BaseEngine):
         self.status = 'Stopping'
         self._stop_requested = True
         self._task_stop.set()
+        # Wake up the threads waiting for the end of a pause.
+        self._task_resume.set()
 
         if force:
             self._force_stop.set()
@@ -213,6 +241,7 @@ class ProcessEngine(BaseEngine):
             self._process.terminate()
             self._log_thread.join()
             self._monitor_thread.join()
+            self._release_ring()
 
             # Discard the queues as they may have been corrupted when the
             # process was terminated.
@@ -235,6 +264,7 @@ class ProcessEngine(BaseEngine):
         self.status = 'Shutting down'
         self._stop_requested = True
         self._task_stop.set()
+        self._task_resume.set()
 
         if not force:
             t = Thread(target=self._cleanup)
@@ -259,6 +289,9 @@ class ProcessEngine(BaseEngine):
     #: Interprocess event signaling the subprocess current job has resumed.
     _task_resumed = Value(factory=Event)
 
+    #: Interprocess event used to resume the subprocess current job.
+    _task_resume = Value(factory=Event)
+
     #: Interprocess event used to stop the subprocess current measurement.
     _task_stop = Value(factory=Event)
 
@@ -294,6 +327,9 @@ class ProcessEngine(BaseEngine):
     #: pause/resume after being asked to do so.
     _pause_thread = Typed(Thread)
 
+    #: Ring in shared memory used by the subprocess to transfer large arrays.
+    _ring = Typed(SharedArrayRing)
+
     def _cleanup(self, process=True):
         """ Helper method taking care of making sure that everybody stops.
 
@@ -321,12 +357,22 @@ class ProcessEngine(BaseEngine):
             self._monitor_thread.join()
             logger.debug('Monitor thread joined')
 
+        self._release_ring()
+
         if self._pause_thread:
             self._pause_thread.join()
             logger.debug('Pause thread joined')
 
         self.status = 'Stopped'
 
+    def _release_ring(self):
+        """Destroy the shared memory ring if it exists.
+
+        """
+        if self._ring is not None:
+            self._ring.close(unlink=True)
+            self._ring = None
+
     def _build_subprocess_args(self, exec_infos):
         """Build the tuple to send to the subprocess.
 
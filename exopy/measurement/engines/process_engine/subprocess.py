@@ -13,13 +13,16 @@ import os
 import logging
 import logging.config
 import sys
+import pickle
+from collections import OrderedDict
+from hashlib import sha1
 from multiprocessing import Process
 from time import sleep
 
 from ....utils.traceback import format_exc
 from ....app.log.tools import (StreamToLogRedirector, DayRotatingTimeHandler)
-from ....tasks.api import build_task_from_config
-from ..utils import MeasureSpy
+from ....tasks.api import BaseTask, build_task_from_config
+from ..utils import MeasureSpy, make_results_picklable
 from ...processor import errors_to_msg
 
 
@@ -57,12 +60,33 @@ class TaskProcess(Process):
     task_paused :
         Event set when the current measurement is paused.
 
+    task_resumed :
+        Event set when the current measurement has resumed.
+
+    task_resume :
+        Event set when the user asked the paused measurement to resume (or
+        to stop).
+
     task_stop :
         Event set when the user asked the running measurement to stop.
 
     process_stop :
         Event set when the user asked the process to stop.
 
+    monitor_rate : float, optional
+        Number of batches of updates of the monitored entries sent per second.
+
+    monitor_ring : SharedArrayRing, optional
+        Ring in shared memory used to transfer the large arrays of the
+        monitored entries.
+
+    tree_cache_size : int, optional
+        Number of built task hierarchies kept to be reused when the same
+        measurement (same configuration and build dependencies) is sent
+        again. The database of a hierarchy is reset to its state before
+        running (and its results discarded) when it is cached. Use 0 to
+        rebuild the tasks for each measurement.
+
     Attributes
     ----------
     meas_log_handler : log handler
@@ -78,18 +102,24 @@ class TaskProcess(Process):
     """
 
     def __init__(self, pipe, log_queue, monitor_queue, task_pause, task_paused,
-                 task_resumed, task_stop, process_stop):
+                 task_resumed, task_resume, task_stop, process_stop,
+                 monitor_rate=20.0, monitor_ring=None, tree_cache_size=0):
         super(TaskProcess, self).__init__(name='exopy.MeasureProcess')
         self.daemon = True
         self.task_pause = task_pause
         self.task_paused = task_paused
         self.task_resumed = task_resumed
+        self.task_resume = task_resume
         self.task_stop = task_stop
         self.process_stop = process_stop
         self.pipe = pipe
         self.log_queue = log_queue
         self.monitor_queue = monitor_queue
+        self.monitor_rate = monitor_rate
+        self.monitor_ring = monitor_ring
+        self.tree_cache_size = tree_cache_size
         self.meas_log_handler = None
+        self._trees = OrderedDict()
 
     def run(self):
         """Method called when the new process starts.
@@ -98,6 +128,10 @@ class TaskProcess(Process):
         docstring.
 
         """
+        # Allow the tasks to use process pools (daemonic processes cannot
+        # have children). The process is still terminated by the engine.
+        self.daemon = False
+
         self._config_log()
 
         # Redirecting stdout and stderr to the logging system.
@@ -134,13 +168,27 @@ class TaskProcess(Process):
                     return
                 self.pipe.send(True)
 
-                # Build it by using the given build dependencies.
-                root = build_task_from_config(config, build, True)
+                # Reuse the tasks built for the same measurement if possible
+                # or build it by using the given build dependencies.
+                key = None
+                if self.tree_cache_size > 0:
+                    key = self._tree_key(config, build)
+                root = self._trees.pop(key, None)
+                if root is not None:
+                    logger.info('Task reused')
+                else:
+                    root = build_task_from_config(config, build, True)
 
                 # Set the specific root database values.
                 for k, v in database.items():
                     root.write_in_database(k, v)
 
+                # Copy the values once the root values (which may create new
+                # entries) are written so that the database can be reset
+                # before caching the tasks.
+                if key is not None:
+                    values = root.database.copy_values()
+
                 # Give all runtime dependencies to the root task.
                 root.run_time = runtime
 
@@ -150,7 +198,8 @@ class TaskProcess(Process):
                 # monitor start a spy to do it.
                 if entries:
                     spy = MeasureSpy(self.monitor_queue, entries,
-                                     root.database)
+                                     root.database, self.monitor_rate,
+                                     self.monitor_ring)
 
                 # Set up the logger for this specific measurement.
                 if self.meas_log_handler is not None:
@@ -172,6 +221,7 @@ class TaskProcess(Process):
                 root.paused = self.task_paused
                 root.should_stop = self.task_stop
                 root.resumed = self.task_resumed
+                root.should_resume = self.task_resume
 
                 # Perform the checks.
                 if checks:
@@ -185,11 +235,19 @@ class TaskProcess(Process):
                     logger.info('Check successful')
                     result = root.perform()
 
-                    self.pipe.send((result, root.errors))
+                    # Pickling every value to check it can be sent is costly
+                    # so the values are checked only if the sending fails
+                    # (in which case nothing was written into the pipe).
+                    try:
+                        self.pipe.send((result, root.errors,
+                                        make_results_picklable(root.results)))
+                    except Exception:
+                        results = make_results_picklable(root.results, True)
+                        self.pipe.send((result, root.errors, results))
 
                 # They fail, mark the measurement as failed and go on.
                 else:
-                    self.pipe.send((False, errors))
+                    self.pipe.send((False, errors, {}))
 
                     # Log the tests that failed.
                     msg = 'Some test failed:\n' + errors_to_msg(errors)
@@ -200,6 +258,12 @@ class TaskProcess(Process):
                     spy.close()
                     del spy
 
+                if key is not None:
+                    self._reset_tree(root, values)
+                    self._trees[key] = root
+                    while len(self._trees) > self.tree_cache_size:
+                        self._trees.popitem(last=False)
+
             except Exception:
                 logger.exception('Error occured during processing')
                 break
@@ -212,6 +276,29 @@ class TaskProcess(Process):
         self.monitor_queue.put_nowait((None, None))
         self.pipe.close()
 
+    def _tree_key(self, config, build):
+        """Key identifying the tasks built from a configuration.
+
+        """
+        return sha1(pickle.dumps((config, build))).digest()
+
+    def _reset_tree(self, root, values):
+        """Bring back a hierarchy to the state it had before running.
+
+        This is done before caching it so that the values and results of the
+        last measurement are not kept alive.
+
+        """
+        root.database.restore_values(values)
+        for task in root.traverse():
+            if isinstance(task, BaseTask):
+                task.clear_database_caches()
+        root.errors = {}
+        root.results = {}
+        root.run_time = {}
+        root.timings = None
+        root.tracer = None
+
     def _config_log(self):
         """Configuring the logger for the process.
 
@@ -10,22 +10,191 @@
 
 """
 import logging
-from threading import Thread
+from mmap import mmap
+from collections import namedtuple
+from threading import Thread, Lock, Event
 from queue import Empty
+from multiprocessing import Value as SharedValue
 from multiprocessing.queues import Queue
-from pickle import dumps
+from multiprocessing.shared_memory import SharedMemory
+from pickle import dumps, loads
 
-from atom.api import Atom, Coerced, Typed
+import numpy as np
+from atom.api import Atom, Coerced, Typed, Float, Int, Dict, Value
 
 from ...utils.traceback import format_exc
 from ...tasks.tasks.database import TaskDatabase
 
 
+#: Descriptor of an array stored in a SharedArrayRing. start and end are the
+#: positions (in bytes written since the creation of the ring) of the data.
+SharedArrayRef = namedtuple('SharedArrayRef', ['start', 'end', 'shape',
+                                               'dtype'])
+
+
+class SharedArrayRing(object):
+    """Ring buffer in shared memory used to transfer arrays between processes.
+
+    The producer copies arrays in the ring and sends only a small descriptor
+    (SharedArrayRef) through a queue. The consumer builds a view on the data
+    without copying them, and releases the space once it is done with them.
+    Descriptors must be released in the order in which they were produced.
+
+    Parameters
+    ----------
+    size : int
+        Size of the ring in bytes.
+
+    name : str, optional
+        Name of an existing shared memory block to attach to. If None a new
+        block is created.
+
+    released : multiprocessing.Value, optional
+        Shared counter of the bytes released by the consumer. Must be provided
+        when attaching to an existing block.
+
+    """
+    #: Alignment of the arrays stored in the ring.
+    ALIGNMENT = 64
+
+    def __init__(self, size, name=None, released=None):
+        if name is None:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            try:
+                self.shm = SharedMemory(name, track=False)
+            except TypeError:  # Python < 3.13
+                self.shm = SharedMemory(name)
+        self.size = size
+        self.released = (released if released is not None else
+                         SharedValue('Q', 0, lock=False))
+        self._written = 0
+
+    def __reduce__(self):
+        """Attach to the same block when sent to a new process.
+
+        """
+        return (type(self), (self.size, self.shm.name, self.released))
+
+    def put(self, array):
+        """Copy an array in the ring.
+
+        Returns
+        -------
+        ref : SharedArrayRef or None
+            Descriptor of the array or None if there is not enough free space
+            in the ring.
+
+        """
+        nbytes = array.nbytes
+        start = self._written
+        pos = start % self.size
+        if pos + nbytes > self.size:
+            # Do not split an array : skip the end of the ring.
+            start += self.size - pos
+            pos = 0
+        end = start + -(-nbytes//self.ALIGNMENT)*self.ALIGNMENT
+        if end - self.released.value > self.size:
+            return None
+
+        view = np.ndarray(array.shape, array.dtype, self.shm.buf, pos)
+        np.copyto(view, array)
+        self._written = end
+        return SharedArrayRef(start, end, array.shape, array.dtype.str)
+
+    def get(self, ref):
+        """Get a view of an array stored in the ring.
+
+        The view is valid only until the descriptor is released.
+
+        """
+        return np.ndarray(ref.shape, np.dtype(ref.dtype), self.shm.buf,
+                          ref.start % self.size)
+
+    @staticmethod
+    def is_view(value):
+        """Check whether a value is a view on the memory of a ring.
+
+        """
+        if not isinstance(value, np.ndarray):
+            return False
+        base = value.base
+        while isinstance(base, np.ndarray):
+            base = base.base
+        return isinstance(base, mmap)
+
+    def release(self, ref):
+        """Release the space used by an array and all the previous ones.
+
+        """
+        self.released.value = ref.end
+
+    def close(self, unlink=False):
+        """Close the access to the shared memory.
+
+        Parameters
+        ----------
+        unlink : bool, optional
+            Whether to destroy the underlying memory block. This should be
+            done only once by the process which created the ring.
+
+        """
+        try:
+            self.shm.close()
+        except BufferError:
+            # Some views on the data are still alive : the mapping will be
+            # closed when they are garbage collected.
+            pass
+        if unlink:
+            self.shm.unlink()
+
+
+def make_results_picklable(results, check=False):
+    """Prepare the results of a measurement to be sent to another process.
+
+    The snapshot of the database is converted into a dictionary mapping the
+    full path of each entry to its value.
+
+    Parameters
+    ----------
+    results : dict
+        Results of the measurement.
+
+    check : bool, optional
+        Whether to check that each value can be pickled, dropping the ones
+        which cannot. As this requires to pickle every value, this should only
+        be done after sending the results without checking failed.
+
+    """
+    results = dict(results)
+    snapshot = results.get('database')
+    if snapshot is not None and not isinstance(snapshot, dict):
+        results['database'] = snapshot.to_dict()
+    if check and results.get('database'):
+        entries = {}
+        for path, value in results['database'].items():
+            try:
+                dumps(value)
+            except Exception:
+                logger = logging.getLogger(__name__)
+                logger.debug('Cannot send the final value of %s', path)
+                continue
+            entries[path] = value
+        results['database'] = entries
+    return results
+
+
 class MeasureSpy(Atom):
     """Spy observing a task database and sending values update into a queue.
 
-    All updates are sent immediatly as no issues have been detected so far.
-    Using a timer based implementation would complicate things.
+    Updates are not sent immediately : only the latest value of each monitored
+    entry is kept and all pending values are sent as a single batch (a
+    pickled list of (entry, value) tuples) at a fixed rate by a background
+    thread. This bounds the cost of the updates for the monitors no matter how
+    fast the measurement writes into the database.
+
+    If a ring is provided, large arrays are transferred through it and only
+    their descriptors go through the queue.
 
     """
     #: Set of entries for which to send notifications.
@@ -37,46 +206,149 @@ class MeasureSpy(Atom):
     #: Queue in which to send the updates.
     queue = Typed(Queue)
 
-    def __init__(self, queue, observed_entries, observed_database):
+    #: Number of batches of updates sent per second (at most).
+    flush_rate = Float(20.0)
+
+    #: Ring in shared memory used to transfer large arrays.
+    ring = Typed(SharedArrayRing)
+
+    #: Minimal size (in bytes) of the arrays sent through the ring.
+    ring_threshold = Int(2**16)
+
+    def __init__(self, queue, observed_entries, observed_database,
+                 flush_rate=20.0, ring=None):
         super(MeasureSpy, self).__init__(queue=queue,
                                          observed_database=observed_database,
-                                         observed_entries=observed_entries)
-        self.observed_database.observe('notifier', self.enqueue_update)
+                                         observed_entries=observed_entries,
+                                         flush_rate=flush_rate, ring=ring)
+        self._flusher = Thread(target=self._flush_periodically,
+                               name='MeasureSpyFlusher', daemon=True)
+        self._flusher.start()
+
+        # Only ask the database to notify the entries we care about.
+        database = self.observed_database
+        observed = database.observed_entries
+        database.observed_entries = (set(self.observed_entries)
+                                     if observed is None else
+                                     observed | self.observed_entries)
+        database.observe('notifier', self.enqueue_update)
 
     def enqueue_update(self, change):
-        """Put an update in the queue.
+        """Store an update until the next batch is sent.
 
         Notes
         -----
-        Change is a tuple as this is connected to a Signal.
+        Change is a tuple as this is connected to a Signal, or a list of
+        tuples for the updates done in a transaction.
 
         """
-        if change[0] in self.observed_entries:
-            try:
-                # Ensure pickling is ok at the cost of a small overhead
-                dumps(change)
-                self.queue.put(change)
-            except Exception:
-                logger = logging.getLogger(__name__)
-                logger.error('Failed to enqueue %s :\n%s' % (change,
-                                                             format_exc()))
+        if isinstance(change, list):
+            observed = self.observed_entries
+            with self._lock:
+                for key, value in change:
+                    if key in observed:
+                        self._pending[key] = value
+            return
+
+        key = change[0]
+        if key in self.observed_entries:
+            with self._lock:
+                self._pending[key] = change[1]
+
+    def flush(self):
+        """Send all the pending updates as a single batch.
+
+        """
+        with self._lock:
+            pending = self._pending
+            if not pending:
+                return
+            self._pending = {}
+
+        batch = list(pending.items())
+        if self.ring is not None:
+            batch = [(k, self._share(v)) for k, v in batch]
+        try:
+            # Pickle here as the queue pickles in a background thread and
+            # would fail silently. The queue then simply copies the bytes.
+            data = dumps(batch)
+        except Exception:
+            batch = [change for change in batch if self._is_picklable(change)]
+            if not batch:
+                return
+            data = dumps(batch)
+        self.queue.put(data)
 
     def close(self):
-        """Put a dummy object signaling that no more updates will be sent.
+        """Send the pending updates and put a dummy object signaling that no
+        more updates will be sent.
 
         """
+        self.observed_database.unobserve('notifier', self.enqueue_update)
+        self.observed_database.observed_entries = None
+        self._stop.set()
+        self._flusher.join()
+        self.flush()
         self.queue.put(('', ''))
 
+    # --- Private API ---------------------------------------------------------
+
+    #: Latest value of the entries updated since the last batch was sent.
+    _pending = Dict()
+
+    #: Lock protecting the access to the pending updates.
+    _lock = Value(factory=Lock)
+
+    #: Event used to stop the background thread sending the batches.
+    _stop = Value(factory=Event)
+
+    #: Background thread sending the batches.
+    _flusher = Typed(Thread)
+
+    def _flush_periodically(self):
+        """Send the pending updates at the specified rate until closed.
+
+        """
+        period = 1/self.flush_rate if self.flush_rate > 0 else 0.05
+        while not self._stop.wait(period):
+            self.flush()
+
+    def _share(self, value):
+        """Store large arrays in the ring and return their descriptor.
+
+        """
+        if (isinstance(value, np.ndarray) and
+                value.nbytes >= self.ring_threshold and
+                not value.dtype.hasobject):
+            ref = self.ring.put(value)
+            if ref is not None:
+                return ref
+        return value
+
+    def _is_picklable(self, change):
+        """Check that an update can be sent and log an error if not.
+
+        """
+        try:
+            dumps(change)
+        except Exception:
+            logger = logging.getLogger(__name__)
+            logger.error('Failed to enqueue %s :\n%s' % (change,
+                                                         format_exc()))
+            return False
+        return True
+
 
 class ThreadMeasureMonitor(Thread):
     """Thread sending a queue content to the news signal of an engine.
 
     """
 
-    def __init__(self, engine, queue):
+    def __init__(self, engine, queue, ring=None):
         super(ThreadMeasureMonitor, self).__init__()
         self.queue = queue
         self.engine = engine
+        self.ring = ring
 
     def run(self):
         """Send the news received from the queue to the engine news signal.
@@ -85,7 +357,12 @@ class ThreadMeasureMonitor(Thread):
         while True:
             try:
                 news = self.queue.get()
-                if news not in [(None, None), ('', '')]:
+                if isinstance(news, bytes):
+                    # Batch pickled by the spy.
+                    news = loads(news)
+                if isinstance(news, list):
+                    self._process_batch(news)
+                elif news not in [(None, None), ('', '')]:
                     # Here progress is a Signal not an Event hence the syntax.
                     self.engine.progress(news)
                 elif news == ('', ''):
@@ -100,3 +377,21 @@ class ThreadMeasureMonitor(Thread):
                 logger = logging.getLogger(__name__)
                 logger.error('Failed to received enqueued object :\n' +
                              format_exc())
+
+    def _process_batch(self, news):
+        """Send a batch of news, resolving the arrays stored in the ring.
+
+        The arrays are views on the shared memory which are released once all
+        observers have processed the batch. Observers must copy them if they
+        need to keep them.
+
+        """
+        refs = [v for _, v in news if isinstance(v, SharedArrayRef)]
+        if refs:
+            news = [(k, self.ring.get(v) if isinstance(v, SharedArrayRef)
+                     else v) for k, v in news]
+        try:
+            self.engine.progress(news)
+        finally:
+            if refs:
+                self.ring.release(refs[-1])
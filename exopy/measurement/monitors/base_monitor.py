@@ -86,7 +86,12 @@ class BaseMonitor(BaseMeasureTool):
 
         This method will be connected to the news signal of the engine when
         the measurement is started. The value received will be a tuple
-        containing the name of the updated database entry and its new value.
+        containing the name of the updated database entry and its new value,
+        or a list of such tuples when the engine sends updates by batch.
+
+        Large arrays may be views on a shared memory which is reused once this
+        method returns : they are valid only during the call and must be
+        copied to be kept (see SharedArrayRing.is_view).
 
         This method is susceptible to be called in a thread that is not the GUI
         thread. Any update of members that are connected to the view should be
@@ -16,6 +16,7 @@ from textwrap import fill
 import enaml
 from atom.api import (List, Dict, ForwardTyped, Property, Value)
 
+from ...engines.utils import SharedArrayRing
 from ..base_monitor import BaseMonitor
 from .entry import MonitoredEntry
 
@@ -64,15 +65,29 @@ class TextMonitor(BaseMonitor):
     known_monitored_entries = Property()
 
     def process_news(self, news):
-        """Handle a news by calling every related entrt updater.
+        """Handle a news by calling every related entry updater.
+
+        When a batch of news is received, each updater is called only once
+        after all the values have been updated. The arrays which are views on
+        a shared memory (reused once the news have been processed) are
+        copied.
 
         """
-        key, value = news
         values = self._database_values
-        values[key] = value
-        if key in self.updaters:
-            for updater in self.updaters[key]:
-                updater(values)
+        if isinstance(news, tuple):
+            news = (news,)
+
+        updaters = []
+        for key, value in news:
+            if SharedArrayRing.is_view(value):
+                value = value.copy()
+            values[key] = value
+            for updater in self.updaters.get(key, ()):
+                if updater not in updaters:
+                    updaters.append(updater)
+
+        for updater in updaters:
+            updater(values)
 
     def refresh_monitored_entries(self, entries=None):
         """Rebuild entries based on the rules and database entries.
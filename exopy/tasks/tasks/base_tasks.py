@@ -24,7 +24,7 @@ from types import MethodType
 from cProfile import Profile
 from operator import attrgetter
 
-from atom.api import (Atom, Int, Bool, Value, Str, List,
+from atom.api import (Atom, Int, Bool, Value, Str, List, Enum, Float,
                       ForwardTyped, Typed, Callable, Dict, Signal,
                       Tuple, Coerced, Constant, set_default)
 from configobj import Section, ConfigObj
@@ -34,10 +34,13 @@ from ...utils.atom_util import (tagged_members, member_to_pref,
                                 update_members_from_preferences)
 from ...utils.container_change import ContainerChange
 from .database import TaskDatabase
-from .decorators import (make_parallel, make_wait, make_stoppable,
-                         smooth_crash)
-from .string_evaluation import safe_eval
+from .decorators import (make_parallel, make_process, make_wait,
+                         make_stoppable, smooth_crash)
+from .string_evaluation import safe_eval, compile_eval, fold_constant
+from .profiling import (TimingsRecorder, TraceRecorder, SamplingProfiler,
+                        make_timed, make_traced)
 from .shared_resources import (SharedCounter, ThreadPoolResource,
+                               ProcessPoolResource, ActivePoolsResource,
                                InstrsResource, FilesResource)
 from . import validators
 
@@ -49,6 +52,40 @@ PREFIX = '_a'
 DEP_TYPE = 'exopy.task'
 
 
+def _extract_references(string):
+    """Extract the names of the database entries referenced in a string.
+
+    """
+    elements = [el for aux in string.split('{') for el in aux.split('}')]
+    return [_split_field(f)[0] for f in elements[1::2]]
+
+
+def _split_field(field):
+    """Split a replacement field into the entry name and the optional
+    conversion and format specification (including the leading '!' or ':').
+
+    """
+    ends = [i for i in (field.find('!'), field.find(':')) if i >= 0]
+    if not ends:
+        return field, ''
+    end = min(ends)
+    return field[:end], field[end:]
+
+
+def _list_tagged_references(obj):
+    """List the database entries referenced by the fmt and feval members of
+    a task or an interface.
+
+    """
+    entries = set()
+    for tag in ('fmt', 'feval'):
+        for name in tagged_members(obj, tag):
+            value = getattr(obj, name)
+            if isinstance(value, str):
+                entries.update(_extract_references(value))
+    return entries
+
+
 class BaseTask(Atom):
     """Base  class defining common members of all Tasks.
 
@@ -110,6 +147,10 @@ class BaseTask(Atom):
 
     #: Dictionary indicating whether the task is executed in parallel
     #: ('activated' key) and which is pool it belongs to ('pool' key).
+    #: Simple tasks can also be executed in a worker process rather than in a
+    #: thread ('process' key), in which case the values of the entries they
+    #: reference are sent to the worker and their entries are updated once
+    #: they complete.
     parallel = Dict(Str()).tag(pref=True)
 
     #: Dictionary indicating whether the task should wait on any pool before
@@ -119,6 +160,12 @@ class BaseTask(Atom):
     #: - 'no_wait' : the list should specify which pool not to wait on.
     wait = Dict(Str()).tag(pref=True)
 
+    #: Names of the entries of the task whose last values should be recorded
+    #: during the execution (see TaskDatabase.get_history). The history is
+    #: recorded only for tasks inside a LoopTask, and holds as many values as
+    #: the closest enclosing loop has points.
+    history_entries = List(Str()).tag(pref=True)
+
     #: Dict of access exception in the database. This should not be manipulated
     #: by user code.
     access_exs = Dict().tag(pref=True)
@@ -182,20 +229,46 @@ class BaseTask(Atom):
         """
         perform_func = self.perform.__func__
         parallel = self.parallel
-        if parallel.get('activated') and parallel.get('pool'):
+        in_pool = parallel.get('activated') and parallel.get('pool')
+        if in_pool and parallel.get('process'):
+            perform_func = make_process(perform_func, parallel['pool'])
+
+        # Time the execution itself (in the thread of the pool if any).
+        root = self.root
+        task_path = self.path + '/' + self.name
+        if root is not None and root.timings is not None and root is not self:
+            timings = root.timings.get_timings(task_path)
+            perform_func = make_timed(perform_func, timings)
+
+        tracer = root.tracer if root is not None else None
+        if tracer is not None and root is not self:
+            perform_func = make_traced(perform_func, tracer, task_path,
+                                       'perform')
+
+        if in_pool:
             perform_func = make_parallel(perform_func, parallel['pool'])
 
         wait = self.wait
         if wait.get('activated'):
             perform_func = make_wait(perform_func,
                                      wait.get('wait'),
-                                     wait.get('no_wait'))
+                                     wait.get('no_wait'),
+                                     tracer)
 
         if self.stoppable:
-            perform_func = make_stoppable(perform_func)
+            perform_func = make_stoppable(perform_func, root)
 
         self.perform_ = MethodType(perform_func, self)
 
+        self._prepare_database_indexes()
+
+        folded = [n for n in tagged_members(self, 'feval')
+                  if self._fold_constant(getattr(self, n))]
+        if folded:
+            logger = logging.getLogger(__name__)
+            logger.debug('%s : folded constant members %s',
+                         self.get_error_path(), ', '.join(folded))
+
     def register_preferences(self):
         """Create the task entries in the preferences object.
 
@@ -351,9 +424,35 @@ class BaseTask(Atom):
             Value to give to the entry.
 
         """
+        index = self._entries_indexes.get(name)
+        if index is not None:
+            return self.database.set_value_by_index(index, value)
+
         value_name = self._task_entry(name)
         return self.database.set_value(self.path, value_name, value)
 
+    def write_values_in_database(self, values):
+        """Write several values in the database at once.
+
+        In running mode, the values are written atomically (the other threads
+        see either none or all of them) and a single notification is emitted.
+
+        Parameters
+        ----------
+        values : dict
+            Values to write, keyed by the simple names of the entries.
+
+        """
+        indexes = self._entries_indexes
+        with self.database.transaction() as transaction:
+            for name, value in values.items():
+                index = indexes.get(name)
+                if index is not None:
+                    transaction.set_value_by_index(index, value)
+                else:
+                    transaction.set_value(self.path, self._task_entry(name),
+                                          value)
+
     def get_from_database(self, full_name):
         """Access to a database value using full name.
 
@@ -365,7 +464,18 @@ class BaseTask(Atom):
             the database.
 
         """
-        return self.database.get_value(self.path, full_name)
+        index = self._read_indexes.get(full_name)
+        if index is not None:
+            return self.database.get_value_by_index(index)
+
+        database = self.database
+        if database.running:
+            index = database.get_entries_indexes(self.path,
+                                                 (full_name,))[full_name]
+            self._read_indexes[full_name] = index
+            return database.get_value_by_index(index)
+
+        return database.get_value(self.path, full_name)
 
     def remove_from_database(self, full_name):
         """Delete a database entry using its full name.
@@ -380,15 +490,23 @@ class BaseTask(Atom):
         """
         return self.database.delete_value(self.path, full_name)
 
-    def list_accessible_database_entries(self):
+    def list_accessible_database_entries(self, prefix=''):
         """List the database entries accessible from this task.
 
+        Parameters
+        ----------
+        prefix : unicode, optional
+            Only list the entries starting with this prefix.
+
         """
-        return self.database.list_accessible_entries(self.path)
+        return self.database.list_accessible_entries(self.path, prefix)
 
     def format_string(self, string):
         """Replace values between {} by their corresponding database value.
 
+        A conversion and a format specification can follow the entry name
+        as for str.format (ex: {Root_val:.3e}).
+
         Parameters
         ----------
         string : str
@@ -403,10 +521,13 @@ class BaseTask(Atom):
         # If a cache evaluation of the string already exists use it.
         if string in self._format_cache:
             preformatted, ids = self._format_cache[string]
-            vals = self.database.get_values_by_index(ids, PREFIX)
-            return preformatted.format(**vals)
+            if ids:
+                vals = self.database.get_values_by_index(ids)
+                return preformatted.format(*vals)
+            return preformatted
 
-        # Otherwise if we are in running mode build a cache formatting.
+        # Otherwise if we are in running mode build a cache formatting, ie a
+        # string formatted using only positional fields.
         elif self.database.running:
             database = self.database
             aux_strings = string.split('{')
@@ -414,21 +535,26 @@ class BaseTask(Atom):
                 elements = [el
                             for aux in aux_strings
                             for el in aux.split('}')]
-                database_indexes = database.get_entries_indexes(self.path,
-                                                                elements[1::2])
+                fields = [_split_field(f) for f in elements[1::2]]
+                database_indexes = database.get_entries_indexes(
+                    self.path, [name for name, _ in fields])
+
+                # Several fields can refer to the same entry.
+                indexes = list(dict.fromkeys(database_indexes.values()))
+                positions = {index: str(i) for i, index in enumerate(indexes)}
                 str_to_format = ''
                 length = len(elements)
                 for i in range(0, length, 2):
                     if i + 1 < length:
-                        repl = PREFIX + str(database_indexes[elements[i + 1]])
+                        name, spec = fields[i//2]
+                        repl = positions[database_indexes[name]] + spec
                         str_to_format += elements[i] + '{' + repl + '}'
                     else:
                         str_to_format += elements[i]
 
-                indexes = database_indexes.values()
                 self._format_cache[string] = (str_to_format, indexes)
-                vals = self.database.get_values_by_index(indexes, PREFIX)
-                return str_to_format.format(**vals)
+                vals = database.get_values_by_index(indexes)
+                return str_to_format.format(*vals)
             else:
                 self._format_cache[string] = (string, [])
                 return string
@@ -442,13 +568,14 @@ class BaseTask(Atom):
                 elements = [el
                             for aux in aux_strings
                             for el in aux.split('}')]
-                replacement_values = [database.get_value(self.path, key)
-                                      for key in elements[1::2]]
+                fields = [_split_field(f) for f in elements[1::2]]
+                replacement_values = [database.get_value(self.path, name)
+                                      for name, _ in fields]
                 str_to_format = ''
-                for key in elements[::2]:
-                    str_to_format += key + '{}'
+                for key, (_, spec) in zip(elements[::2], fields):
+                    str_to_format += key + '{' + spec + '}'
 
-                str_to_format = str_to_format[:-2]
+                str_to_format += elements[-1]
 
                 return str_to_format.format(*replacement_values)
             else:
@@ -470,11 +597,13 @@ class BaseTask(Atom):
         """
         # If a cache evaluation of the string already exists use it.
         if string in self._eval_cache:
-            preformatted, ids = self._eval_cache[string]
-            vals = self.database.get_values_by_index(ids, PREFIX)
-            return safe_eval(preformatted, vals)
+            func, ids = self._eval_cache[string]
+            if ids:
+                return func(*self.database.get_values_by_index(ids))
+            return func()
 
-        # Otherwise if we are in running mode build a cache evaluation.
+        # Otherwise if we are in running mode build a cache evaluation, ie a
+        # function taking as arguments the values of the referenced entries.
         elif self.database.running:
             database = self.database
             aux_strings = string.split('{')
@@ -493,13 +622,16 @@ class BaseTask(Atom):
                     else:
                         str_to_eval += elements[i]
 
-                indexes = database_indexes.values()
-                self._eval_cache[string] = (str_to_eval, indexes)
-                vals = self.database.get_values_by_index(indexes, PREFIX)
-                return safe_eval(str_to_eval, vals)
+                # Several names can point to the same entry.
+                indexes = list(dict.fromkeys(database_indexes.values()))
+                func = compile_eval(str_to_eval,
+                                    [PREFIX + str(i) for i in indexes])
+                self._eval_cache[string] = (func, indexes)
+                return func(*database.get_values_by_index(indexes))
             else:
-                self._eval_cache[string] = (string, [])
-                return safe_eval(string, {})
+                func = compile_eval(string, ())
+                self._eval_cache[string] = (func, [])
+                return func()
 
         # In edition mode simply perfom the evaluation as execution time is not
         # critical and as the database has not been collapsed to an indexed
@@ -527,6 +659,18 @@ class BaseTask(Atom):
             else:
                 return safe_eval(string, {})
 
+    def clear_database_caches(self):
+        """Discard the informations cached to access the running database.
+
+        This must be called when the database goes back to edition mode (see
+        TaskDatabase.restore_values).
+
+        """
+        self._format_cache = {}
+        self._eval_cache = {}
+        self._entries_indexes = {}
+        self._read_indexes = {}
+
     def get_error_path(self):
         """Build the path to use when reporting errors during checks.
 
@@ -545,6 +689,77 @@ class BaseTask(Atom):
     #: Only used in running mode.
     _eval_cache = Dict()
 
+    #: Indexes in the flat database of the task entries, keyed by the simple
+    #: name of the entry. Only used in running mode.
+    _entries_indexes = Dict()
+
+    #: Indexes in the flat database of the entries read by the task, keyed by
+    #: the full name of the entry. Only used in running mode.
+    _read_indexes = Dict()
+
+    def _list_referenced_entries(self):
+        """List the database entries whose value is used by the task.
+
+        By default, the entries referenced in the members tagged with 'fmt'
+        and 'feval' are listed.
+
+        """
+        return _list_tagged_references(self)
+
+    def _fold_constant(self, string):
+        """Evaluate once and for all an expression not referencing any
+        database entry.
+
+        The result is stored in the evaluation cache so that
+        format_and_eval_string does not need to evaluate it again.
+
+        Returns
+        -------
+        folded : bool
+            Whether or not the expression could be folded.
+
+        """
+        func = fold_constant(string)
+        if func is None:
+            return False
+        self._eval_cache[string] = (func, [])
+        return True
+
+    def _prepare_database_indexes(self):
+        """Resolve the flat database indexes of the task entries and of the
+        entries it references.
+
+        This is a no-op if the database is not in running mode.
+
+        """
+        database = self.database
+        if database is None or not database.running:
+            return
+
+        entries = {self._task_entry(e): e for e in self.database_entries}
+        self._entries_indexes = {entries[k]: i for k, i in
+                                 self._resolve_indexes(entries).items()}
+        self._read_indexes = self._resolve_indexes(
+            set(entries) | self._list_referenced_entries())
+
+    def _resolve_indexes(self, names):
+        """Get the flat database indexes of the entries accessible from the
+        task.
+
+        Entries which cannot be found are simply ignored as this will be
+        reported by the checks.
+
+        """
+        database = self.database
+        indexes = {}
+        for name in names:
+            try:
+                indexes.update(database.get_entries_indexes(self.path,
+                                                            (name,)))
+            except KeyError:
+                continue
+        return indexes
+
     def _default_task_id(self):
         """Default value for the task_id member.
 
@@ -677,14 +892,19 @@ class ComplexTask(BaseTask):
         """Run sequentially all child tasks.
 
         """
-        for child in self.children:
-            child.perform_()
+        for perform in self._execution_plan():
+            perform()
 
     def check(self, *args, **kwargs):
         """Run test of all child tasks.
 
         """
         test, traceback = super(ComplexTask, self).check(*args, **kwargs)
+        if self.parallel.get('process'):
+            test = False
+            traceback[self.get_error_path() + '-parallel'] = \
+                'Only simple tasks can be executed in a separate process.'
+
         for child in self.gather_children():
             try:
                 check = child.check(*args, **kwargs)
@@ -704,6 +924,7 @@ class ComplexTask(BaseTask):
         super(ComplexTask, self).prepare()
         for child in self.gather_children():
             child.prepare()
+        self._plan = tuple(child.perform_ for child in self.children)
 
     def add_child_task(self, index, child):
         """Add a child task at the given index.
@@ -718,6 +939,7 @@ class ComplexTask(BaseTask):
 
         """
         self.children.insert(index, child)
+        self._plan = None
 
         # In the absence of a root task do nothing else than inserting the
         # child.
@@ -756,6 +978,7 @@ class ComplexTask(BaseTask):
         """
         child = self.children.pop(old)
         self.children.insert(new, child)
+        self._plan = None
 
         # In the absence of a root task do nothing else than moving the
         # child.
@@ -778,6 +1001,7 @@ class ComplexTask(BaseTask):
 
         """
         child = self.children.pop(index)
+        self._plan = None
 
         # Cleanup database, update preferences
         child.unregister_from_database()
@@ -976,6 +1200,22 @@ class ComplexTask(BaseTask):
     #: child disabled some access_exs.
     _disabled_exs = List()
 
+    #: Prepared perform_ methods of the children, in order, built by prepare
+    #: so that executing the children does not require any lookup.
+    _plan = Value()
+
+    def _execution_plan(self):
+        """Get the perform_ methods of the children to call in order.
+
+        If the children changed since the task was prepared, the plan is built
+        from the current children.
+
+        """
+        plan = self._plan
+        if plan is None:
+            plan = tuple(child.perform_ for child in self.children)
+        return plan
+
     def _child_path(self):
         """Convenience function returning the path to set for child task.
 
@@ -1006,6 +1246,12 @@ class ComplexTask(BaseTask):
             # Update the path of all children.
             self._update_children_path()
 
+    def _post_setattr_children(self, old, new):
+        """Discard the execution plan built for the previous children.
+
+        """
+        self._plan = None
+
     def _post_setattr_root(self, old, new):
         """Make sure that all children get all the info they need to behave
         correctly when the task get its root parent (ie the task is now
@@ -1047,6 +1293,27 @@ class RootTask(ComplexTask):
     #: Should the execution be profiled.
     should_profile = Bool().tag(pref=True)
 
+    #: Profiler to use when should_profile is True. The deterministic profiler
+    #: (cProfile) only sees the thread calling perform and slows down the
+    #: execution. The sampling profiler periodically samples the stacks of
+    #: all threads and saves them in the collapsed (flamegraph) format.
+    profile_mode = Enum('deterministic', 'sampling').tag(pref=True)
+
+    #: Number of samples taken per second by the sampling profiler.
+    sampling_rate = Float(100.0).tag(pref=True)
+
+    #: Should the execution time of each task be recorded. The statistics are
+    #: saved next to the measurement and stored in results.
+    should_time_tasks = Bool().tag(pref=True)
+
+    #: Should a trace of the execution (in the Chrome trace event format) be
+    #: saved next to the measurement.
+    should_trace = Bool().tag(pref=True)
+
+    #: Maximal number of threads used by each execution pool (used by the
+    #: parallel tasks). The size of the pools not listed is not limited.
+    pool_sizes = Dict().tag(pref=True)
+
     #: Dict storing data needed at execution time (ex: drivers classes)
     run_time = Dict()
 
@@ -1059,6 +1326,11 @@ class RootTask(ComplexTask):
     #: Inter-process event signaling the task is paused.
     paused = Typed(Event)
 
+    #: Inter-process event signaling the task it should resume execution
+    #: (also set when the task should stop while paused). When provided, it
+    #: is waited upon during a pause, otherwise the pause flag is polled.
+    should_resume = Typed(Event)
+
     #: Inter-process event signaling the main thread is done, handling the
     #: measurement resuming, and hence notifying the task execution has
     #: resumed.
@@ -1067,15 +1339,29 @@ class RootTask(ComplexTask):
     #: Dictionary used to store errors occuring during performing.
     errors = Dict()
 
+    #: Dictionary used to store the results of the execution : the final
+    #: state of the database (a DatabaseSnapshot stored under 'database') and
+    #: optional informations (ex: the timings of the tasks).
+    results = Dict()
+
+    #: Recorder collecting the execution time of the tasks (only used if
+    #: should_time_tasks is True).
+    timings = Typed(TimingsRecorder)
+
+    #: Recorder collecting the events of the execution (only used if
+    #: should_trace is True).
+    tracer = Typed(TraceRecorder)
+
     #: Dictionary used to store references to resources that may need to be
     #: shared between task and which must be released when all tasks have been
     #: performed.
     #: Each key is associated to a different kind of resource. Resources must
     #: be stored in SharedDict subclass.
-    #: By default three kind of resources exists:
+    #: By default the following kinds of resources exist:
     #:
-    #: - threads : used threads grouped by pool.
-    #: - active_threads : currently active threads.
+    #: - threads : executors used by each pool.
+    #: - processes : process executors used by each pool.
+    #: - active_threads : currently active dispatchers grouped by pool.
     #: - instrs : used instruments referenced by profiles.
     #: - files : currently opened files by path.
     #:
@@ -1139,13 +1425,23 @@ class RootTask(ComplexTask):
 
         self.prepare()
 
-        pr = Profile() if self.should_profile else None
+        pr = sampler = None
+        if self.should_profile:
+            if self.profile_mode == 'sampling':
+                sampler = SamplingProfiler(rate=self.sampling_rate)
+            else:
+                pr = Profile()
 
+        tracer = self.tracer
         try:
             if pr:
                 pr.enable()
-            for child in self.children:
-                child.perform_()
+            if sampler:
+                sampler.start()
+            if tracer:
+                tracer.begin(self.path, 'perform')
+            for perform in self._execution_plan():
+                perform()
         except Exception:
             log = logging.getLogger(__name__)
             msg = 'The following unhandled exception occured :\n'
@@ -1156,12 +1452,22 @@ class RootTask(ComplexTask):
         finally:
             if pr:
                 pr.disable()
-                meas_name = self.get_from_database('meas_name')
-                meas_id = self.get_from_database('meas_id')
-                path = os.path.join(self.default_path,
-                                    meas_name + '_' + meas_id + '.prof')
-                pr.dump_stats(path)
+                pr.dump_stats(self._get_output_path('.prof'))
             self.release_resources()
+            # Taken once the pools are drained so that the values written by
+            # the tasks executed in their threads are included.
+            self.results['database'] = self.database.snapshot()
+            # Stopped only once the pools are drained so that the tasks
+            # executed in their threads are sampled.
+            if sampler:
+                sampler.stop()
+                sampler.save(self._get_output_path('.folded'))
+            if tracer:
+                tracer.end(self.path, 'perform')
+                tracer.save(self._get_output_path('.trace.json'))
+            if self.timings:
+                self.results['timings'] = self.timings.report()
+                self.timings.save(self._get_output_path('.timings.csv'))
 
         if self.should_stop.is_set():
             result = False
@@ -1176,6 +1482,8 @@ class RootTask(ComplexTask):
         # forced-enqueueing) so we need to make sure we set the default path.
         self.write_in_database('default_path', self.default_path)
         self.database.prepare_to_run()
+        self.timings = TimingsRecorder() if self.should_time_tasks else None
+        self.tracer = TraceRecorder() if self.should_trace else None
         super().prepare()
 
     def release_resources(self):
@@ -1264,6 +1572,17 @@ class RootTask(ComplexTask):
         """
         return entry
 
+    def _get_output_path(self, extension):
+        """Build the path of a file generated by the execution.
+
+        The file is saved in the default path and named after the measurement.
+
+        """
+        meas_name = self.get_from_database('meas_name')
+        meas_id = self.get_from_database('meas_id')
+        return os.path.join(self.default_path,
+                            meas_name + '_' + meas_id + extension)
+
     def _state(self, change):
         """Determine whether the task is paused or not.
 
@@ -1283,9 +1602,9 @@ class RootTask(ComplexTask):
         """Default resources.
 
         """
-        return {'threads': ThreadPoolResource(),
-                # Reduce priority to stop through the thread resource.
-                # This is far less likely to cause a deadlock.
-                'active_threads': ThreadPoolResource(priority=0),
+        return {'threads': ThreadPoolResource(pool_sizes=self.pool_sizes),
+                'processes': ProcessPoolResource(pool_sizes=self.pool_sizes),
+                # Released after the executors, once all work is done.
+                'active_threads': ActivePoolsResource(priority=0),
                 'instrs': InstrsResource(),
                 'files': FilesResource()}
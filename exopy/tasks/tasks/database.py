@@ -12,8 +12,59 @@ The base tasks define how task interact between them and with the database, how
 ressources can be shared and how preferences are handled.
 
 """
-from atom.api import Atom, Dict, Bool, Value, Signal, List, Typed, ForwardTyped
-from threading import Lock
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import deepcopy
+from hashlib import blake2b
+from threading import Lock, RLock
+
+import numpy as np
+from atom.api import (Atom, Dict, Bool, Value, Signal, List, Typed, Int,
+                      ForwardTyped)
+
+
+#: Number of locks used to protect the entries updated by transactions and the
+#: entries whose updates are notified or recorded.
+LOCK_STRIPES = 16
+
+#: Flag marking the entries whose updates are notified.
+NOTIFY_FLAG = 1
+
+#: Flag marking the entries whose values history is recorded.
+HISTORY_FLAG = 2
+
+#: Number of lock-free attempts to read a consistent set of entries before
+#: falling back to locking.
+SNAPSHOT_ATTEMPTS = 8
+
+#: Maximal number of flat layouts kept in the layout cache.
+LAYOUT_CACHE_SIZE = 16
+
+#: Flat layouts (paths, entry index map) computed by prepare_to_run keyed by
+#: the structural fingerprint of the database they were computed for.
+_LAYOUT_CACHE = OrderedDict()
+_LAYOUT_CACHE_LOCK = Lock()
+
+
+def _drop_subtree(cache, path):
+    """Remove from a dict keyed by path a node and all its descendants.
+
+    """
+    prefix = path + '/'
+    for key in [k for k in cache if k == path or k.startswith(prefix)]:
+        del cache[key]
+
+
+def _promote(old, new):
+    """Type able to store both types or object if there is none.
+
+    """
+    numeric = 'biufc'
+    if ((old.kind in numeric and new.kind in numeric) or
+            (old.kind == new.kind and old.kind in 'US')):
+        return np.result_type(old, new)
+    return np.dtype(object)
 
 
 class DatabaseNode(Atom):
@@ -43,13 +94,31 @@ class TaskDatabase(Atom):
       In running mode the database is thread safe but the object it contains
       may not be so (dict, list, etc)
 
+    In running mode, the following guarantees hold for any number of threads:
+
+    - reading a single entry never blocks and is atomic (a reader sees either
+      the old or the new value). Writing a single entry never blocks unless
+      its updates are notified or recorded.
+    - the writes done in a transaction are atomic with respect to the other
+      transactions and to get_values_by_index : a reader sees either none or
+      all of them. Transactions hold the locks of the stripes of the entries
+      they update while writing and only briefly share a global lock to
+      publish their state when starting and ending.
+    - the updates of an entry are notified and recorded in its history in
+      the order in which they are written. To do so, the notifications are
+      emitted while holding the lock protecting the entry : observers must
+      not wait for other threads writing into the database.
+    - get_values_by_index does not take any lock unless transactions keep
+      being committed while it reads.
+
     """
     #: Signal used to notify a value changed in the database.
     #: In edition mode the update is passed as a tuple ('added', path, value)
     #: for creation, as ('renamed', old, new, value) in case of renaming,
     #: ('removed', old) in case of deletion or as a list of such tuples.
     #: In running mode, a 2-tuple (path, value) is sent as entries cannot be
-    #: renamed or removed.
+    #: renamed or removed (only for the entries listed in observed_entries),
+    #: or a list of such tuples for the updates done in a transaction.
     notifier = Signal()
 
     #: Signal emitted to notify that access exceptions has changed. The update
@@ -74,6 +143,11 @@ class TaskDatabase(Atom):
     #: running mode the database is flattened into a list for faster acces.
     running = Bool(False)
 
+    #: Full paths of the entries whose updates should be notified in running
+    #: mode. If None, all updates are notified. Updates of other entries are
+    #: simply stored.
+    observed_entries = Value()
+
     def set_value(self, node_path, value_name, value):
         """Method used to set the value of the entry at the specified path
 
@@ -100,17 +174,24 @@ class TaskDatabase(Atom):
         """
         new_val = False
         if self.running:
-            full_path = node_path + '/' + value_name
-            index = self._entry_index_map[full_path]
-            with self._lock:
+            index = self._entry_index_map[node_path + '/' + value_name]
+            flags = self._flags[index]
+            if flags:
+                self._write_tracked(index, value, flags)
+            else:
                 self._flat_database[index] = value
-                self.notifier((node_path + '/' + value_name, value))
         else:
             node = self.go_to_path(node_path)
             if value_name not in node.data:
                 new_val = True
+            elif isinstance(node.data[value_name], DatabaseNode):
+                self._invalidate_nodes(node_path + '/' + value_name)
+                self._invalidate_entries(node_path)
+                self._record_structure('replace_node', node_path, value_name)
             node.data[value_name] = value
             if new_val:
+                self._invalidate_entries(node_path)
+                self._record_structure('value', node_path, value_name)
                 self.notifier(('added', node_path + '/' + value_name, value))
 
         return new_val
@@ -141,25 +222,151 @@ class TaskDatabase(Atom):
             return self._flat_database[index]
 
         else:
-            node = self.go_to_path(assumed_path)
+            path = assumed_path
+            node = self.go_to_path(path)
+            while True:
+                # First check if the entry is in the current node.
+                if value_name in node.data:
+                    return node.data[value_name]
+
+                # Second check if there is a special rule about this entry.
+                access = node.meta.get('access')
+                if access and value_name in access:
+                    path = path + '/' + access[value_name]
+                    node = self.go_to_path(path)
+
+                # Finally go one step up in the node hierarchy.
+                elif node.parent is not None:
+                    path = path.rpartition('/')[0]
+                    node = node.parent
 
-            # First check if the entry is in the current node.
-            if value_name in node.data:
-                value = node.data[value_name]
-                return value
-
-            # Second check if there is a special rule about this entry.
-            elif 'access' in node.meta and value_name in node.meta['access']:
-                path = assumed_path + '/' + node.meta['access'][value_name]
-                return self.get_value(path, value_name)
-
-            # Finally go one step up in the node hierarchy.
-            else:
-                new_assumed_path = assumed_path.rpartition('/')[0]
-                if assumed_path == new_assumed_path:
+                else:
                     mes = "Can't find database entry : {}".format(value_name)
                     raise KeyError(mes)
-                return self.get_value(new_assumed_path, value_name)
+
+    def set_value_by_index(self, index, value):
+        """Set the value of an entry using its index in the flat database.
+
+        This method can only be used in running mode.
+
+        Parameters
+        ----------
+        index : int
+            Index of the entry in the flat database as returned by
+            get_entries_indexes.
+
+        value : any
+            Actual value to be stored
+
+        Returns
+        -------
+        new_val : bool
+            Always False as no entry can be created in running mode.
+
+        """
+        flags = self._flags[index]
+        if flags:
+            self._write_tracked(index, value, flags)
+        else:
+            self._flat_database[index] = value
+
+        return False
+
+    def is_tracked(self, index):
+        """Check whether the updates of an entry are notified or recorded.
+
+        This method can only be used in running mode.
+
+        Parameters
+        ----------
+        index : int
+            Index of the entry in the flat database as returned by
+            get_entries_indexes.
+
+        """
+        return bool(self._flags[index])
+
+    def set_values_by_index(self, updates):
+        """Set the values of several entries at once.
+
+        The update is atomic (see the class docstring) and a single
+        notification is emitted for all the updated entries. This method can
+        only be used in running mode.
+
+        Parameters
+        ----------
+        updates : list
+            List of (index, value) tuples, the indexes being the ones returned
+            by get_entries_indexes.
+
+        """
+        flat = self._flat_database
+        stripes = self._stripes
+        locks = [stripes[i] for i in
+                 sorted({index % LOCK_STRIPES for index, _ in updates})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            self._begin_transaction()
+            try:
+                for index, value in updates:
+                    flat[index] = value
+            finally:
+                self._end_transaction()
+
+            # Still holding the locks so that concurrent updates of the same
+            # entries are recorded and notified in order.
+            flags = self._flags
+            histories = self._histories
+            for index, value in updates:
+                if flags[index] & HISTORY_FLAG:
+                    histories[index].append(value)
+
+            paths = self._flat_paths
+            news = [(paths[i], v) for i, v in updates
+                    if flags[i] & NOTIFY_FLAG]
+            if len(news) == 1:
+                self.notifier(news[0])
+            elif news:
+                self.notifier(news)
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    @contextmanager
+    def transaction(self):
+        """Group several writes into a single atomic update.
+
+        In running mode, the writes done through the yielded
+        DatabaseTransaction are buffered and applied when the context exits
+        without error using set_values_by_index. The new values are hence not
+        visible before the context exits. In edition mode, the writes are
+        applied immediately.
+
+        """
+        transaction = DatabaseTransaction(database=self)
+        yield transaction
+        if transaction.updates:
+            self.set_values_by_index(transaction.updates)
+
+    def get_value_by_index(self, index):
+        """Get the value of an entry using its index in the flat database.
+
+        This method can only be used in running mode.
+
+        Parameters
+        ----------
+        index : int
+            Index of the entry in the flat database as returned by
+            get_entries_indexes.
+
+        Returns
+        -------
+        value : object
+            Value stored in the entry.
+
+        """
+        return self._flat_database[index]
 
     def rename_values(self, node_path, old, new, access_exs=None):
         """Rename database entries.
@@ -190,10 +397,17 @@ class TaskDatabase(Atom):
         notif = []
         acc_notif = []
         access_exs = access_exs if access_exs else {}
+        # Recorded first as the node is modified even if a renaming fails.
+        self._record_structure('rename_values', node_path, tuple(old),
+                               tuple(new), sorted(access_exs.items()))
+
+        self._invalidate_entries(node_path)
 
         for i, old_name in enumerate(old):
             if old_name in node.data:
                 val = node.data.pop(old_name)
+                if isinstance(val, DatabaseNode):
+                    self._invalidate_nodes(node_path + '/' + old_name)
                 node.data[new[i]] = val
                 notif.append(('renamed',
                               node_path + '/' + old_name,
@@ -209,6 +423,7 @@ class TaskDatabase(Atom):
                         count -= 1
                     path = n.meta['access'].pop(old_name)
                     n.meta['access'][new[i]] = path
+                    self._invalidate_entries(p)
                     acc_notif.append(('renamed', p, path, old_name, new[i]))
             else:
                 err_str = 'No entry {} in node {}'.format(old_name,
@@ -244,7 +459,11 @@ class TaskDatabase(Atom):
             node = self.go_to_path(node_path)
 
             if value_name in node.data:
-                del node.data[value_name]
+                val = node.data.pop(value_name)
+                if isinstance(val, DatabaseNode):
+                    self._invalidate_nodes(node_path + '/' + value_name)
+                self._invalidate_entries(node_path)
+                self._record_structure('delete_value', node_path, value_name)
                 self.notifier(('removed', node_path + '/' + value_name))
             else:
                 err_str = 'No entry {} in node {}'.format(value_name,
@@ -270,10 +489,85 @@ class TaskDatabase(Atom):
             prefix was not None.
 
         """
+        flat = self._flat_database
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            state = self._transactions_state
+            if state[1]:
+                continue
+            values = [flat[i] for i in indexes]
+            if self._transactions_state is state:
+                break
+        else:
+            values = self._locked_read(indexes)
+
         if prefix is None:
-            return [self._flat_database[i] for i in indexes]
+            return values
+        else:
+            return {prefix + str(i): v for i, v in zip(indexes, values)}
+
+    def enable_history(self, path, size):
+        """Record the last values of an entry.
+
+        This method can only be used in running mode. Calling it again for
+        the same entry discards the recorded values.
+
+        Parameters
+        ----------
+        path : str
+            Path of the entry whose history should be recorded.
+
+        size : int
+            Number of values to keep.
+
+        """
+        index = self._entry_index_map[path]
+        self._histories[index] = EntryHistory(size=size)
+        self._flags[index] |= HISTORY_FLAG
+
+    def get_history(self, path):
+        """Get the recorded values of an entry.
+
+        Parameters
+        ----------
+        path : str
+            Path of the entry.
+
+        Returns
+        -------
+        history : numpy.ndarray or None
+            Read-only view of the recorded values (oldest first) or None if the
+            history of the entry is not recorded.
+
+        """
+        history = self._histories.get(self._entry_index_map[path])
+        return history.view() if history is not None else None
+
+    def snapshot(self):
+        """Take a consistent snapshot of the values of the database.
+
+        This method can only be used in running mode. It never blocks writers
+        (save if transactions keep being committed while copying) and the
+        returned object is not affected by later writes.
+
+        Returns
+        -------
+        snapshot : DatabaseSnapshot
+            Copy of the values stored in the flat database.
+
+        """
+        flat = self._flat_database
+        for _ in range(SNAPSHOT_ATTEMPTS):
+            state = self._transactions_state
+            if state[1]:
+                continue
+            values = list(flat)
+            if self._transactions_state is state:
+                break
         else:
-            return {prefix + str(i): self._flat_database[i] for i in indexes}
+            values = self._locked_read(range(len(flat)))
+
+        return DatabaseSnapshot(values=values, paths=self._flat_paths,
+                                index_map=self._entry_index_map)
 
     def get_entries_indexes(self, assumed_path, entries):
         """ Access to the index in the flattened database for some entries.
@@ -296,7 +590,7 @@ class TaskDatabase(Atom):
         return {name: self._find_index(assumed_path, name)
                 for name in entries}
 
-    def list_accessible_entries(self, node_path):
+    def list_accessible_entries(self, node_path, prefix=''):
         """Method used to get a list of all entries accessible from a node.
 
         DO NOT USE THIS METHOD IN RUNNING MODE (ie never in the check method
@@ -308,37 +602,24 @@ class TaskDatabase(Atom):
         node_path : unicode
             Path to the node from which accessible entries should be listed.
 
+        prefix : unicode, optional
+            Only list the entries starting with this prefix.
+
         Returns
         -------
         entries_list : list(unicode)
-            List of entries accessible from the specified node
+            Sorted list of entries accessible from the specified node
 
         """
-        entries = []
-        while True:
-            node = self.go_to_path(node_path)
-            keys = node.data.keys()
-            # Looking for the entries in the node.
-            for key in keys:
-                if not isinstance(node.data[key], DatabaseNode):
-                    entries.append(key)
-
-            # Adding the special access if they are not already in the list.
-            for entry in node.meta.get('access', []):
-                if entry not in entries:
-                    entries.append(entry)
-
-            if node_path != 'root':
-                # Going to the next node.
-                node_path = node_path.rpartition('/')[0]
-            else:
-                break
+        entries = self._accessible_entries(node_path)[1]
+        if not prefix:
+            return list(entries)
 
-        for entry in self.excluded:
-            if entry in entries:
-                entries.remove(entry)
-
-        return sorted(entries)
+        start = bisect_left(entries, prefix)
+        stop = start
+        while stop < len(entries) and entries[stop].startswith(prefix):
+            stop += 1
+        return entries[start:stop]
 
     def list_all_entries(self, path='root', values=False):
         """List all entries in the database.
@@ -407,6 +688,8 @@ class TaskDatabase(Atom):
             access_exceptions[entry] = rel_path
         else:
             node.meta['access'] = {entry: rel_path}
+        self._invalidate_entries(node_path)
+        self._record_structure('access', node_path, rel_path, entry)
         self.access_notifier(('added', node_path, rel_path, entry))
 
     def remove_access_exception(self, node_path, entry=None):
@@ -430,6 +713,8 @@ class TaskDatabase(Atom):
         else:
             relative_path = ''
             del node.meta['access']
+        self._invalidate_entries(node_path)
+        self._record_structure('remove_access', node_path, entry)
         self.access_notifier(('removed', node_path, relative_path, entry))
 
     def create_node(self, parent_path, node_name):
@@ -454,7 +739,10 @@ class TaskDatabase(Atom):
 
         parent_node = self.go_to_path(parent_path)
         node = DatabaseNode(parent=parent_node)
+        if node_name in parent_node.data:
+            self._invalidate_nodes(parent_path + '/' + node_name)
         parent_node.data[node_name] = node
+        self._record_structure('node', parent_path, node_name)
         self.nodes_notifier(('added', parent_path, node_name, node))
 
     def rename_node(self, parent_path, old_name, new_name):
@@ -478,6 +766,8 @@ class TaskDatabase(Atom):
         parent_node = self.go_to_path(parent_path)
         parent_node.data[new_name] = parent_node.data[old_name]
         del parent_node.data[old_name]
+        self._invalidate_nodes(parent_path + '/' + old_name)
+        self._invalidate_nodes(parent_path + '/' + new_name)
 
         while parent_node:
             if 'access' not in parent_node.meta:
@@ -491,6 +781,7 @@ class TaskDatabase(Atom):
 
             parent_node = parent_node.parent
 
+        self._record_structure('rename_node', parent_path, old_name, new_name)
         self.nodes_notifier(('renamed', parent_path, old_name, new_name))
 
     def delete_node(self, parent_path, node_name):
@@ -511,11 +802,13 @@ class TaskDatabase(Atom):
         parent_node = self.go_to_path(parent_path)
         if node_name in parent_node.data:
             del parent_node.data[node_name]
+            self._invalidate_nodes(parent_path + '/' + node_name)
         else:
             err_str = 'No node {} at the path {}'.format(node_name,
                                                          parent_path)
             raise KeyError(err_str)
 
+        self._record_structure('delete_node', parent_path, node_name)
         self.nodes_notifier(('removed', parent_path, node_name))
 
     def copy_node_values(self, node='root'):
@@ -541,15 +834,38 @@ class TaskDatabase(Atom):
 
         This is used when tasks are executed.
 
+        Databases built through the same sequence of structural edits share
+        the same fingerprint and the flat layout (paths and index map)
+        computed for the first of them is shared : the nodes are still walked
+        to gather the values but no path is built.
+
         """
-        self._lock = Lock()
+        self._stripes = [RLock() for _ in range(LOCK_STRIPES)]
+        self._transactions_lock = Lock()
+        self._transactions_state = (0, 0)
         self.running = True
 
+        fingerprint = self.fingerprint()
+        with _LAYOUT_CACHE_LOCK:
+            layout = _LAYOUT_CACHE.get(fingerprint)
+            if layout is not None:
+                _LAYOUT_CACHE.move_to_end(fingerprint)
+
+        if layout is not None:
+            paths, mapping = layout
+            self._flat_database = self._gather_values()
+            self._flat_paths = paths
+            self._entry_index_map = mapping
+            self._histories = {}
+            self._update_notified()
+            return
+
         # Flattening the database by walking all the nodes.
         index = 0
         nodes = [('root', self._database)]
         mapping = {}
         datas = []
+        paths = []
         for (node_path, node) in nodes:
             for key, val in node.data.items():
                 path = node_path + '/' + key
@@ -559,6 +875,7 @@ class TaskDatabase(Atom):
                     mapping[path] = index
                     index += 1
                     datas.append(val)
+                    paths.append(path)
 
         # Walking a second time to add the exception to the _entry_index_map,
         # in reverse order in case an entry has multiple exceptions.
@@ -569,8 +886,73 @@ class TaskDatabase(Atom):
                 full_path = node_path + '/' + access[entry] + '/' + entry
                 mapping[short_path] = mapping[full_path]
 
+        with _LAYOUT_CACHE_LOCK:
+            _LAYOUT_CACHE[fingerprint] = (paths, mapping)
+            while len(_LAYOUT_CACHE) > LAYOUT_CACHE_SIZE:
+                _LAYOUT_CACHE.popitem(last=False)
+
         self._flat_database = datas
+        self._flat_paths = paths
         self._entry_index_map = mapping
+        self._histories = {}
+        self._update_notified()
+
+    def copy_values(self):
+        """Copy the values of all the entries.
+
+        This method should only be used in edition mode.
+
+        Returns
+        -------
+        values : list
+            Deep copy of the values of the entries which can be passed to
+            restore_values as long as the structure of the database did not
+            change.
+
+        """
+        return deepcopy(self._gather_values())
+
+    def restore_values(self, values):
+        """Go back to edition mode and restore the values of all the entries.
+
+        The values written while in running mode are discarded.
+
+        Parameters
+        ----------
+        values : list
+            Values of the entries as returned by copy_values. They are copied
+            so that they can be restored several times.
+
+        """
+        self.running = False
+        self._flat_database = []
+        self._histories = {}
+        self._update_notified()
+
+        values = iter(deepcopy(values))
+        nodes = [self._database]
+        for node in nodes:
+            data = node.data
+            for key, val in data.items():
+                if isinstance(val, DatabaseNode):
+                    nodes.append(val)
+                else:
+                    data[key] = next(values)
+
+    def fingerprint(self):
+        """Fingerprint of the structure of the database.
+
+        The fingerprint depends only on the structural edits (creation,
+        renaming and deletion of entries, nodes and access exceptions) done on
+        the database, not on the values of the entries.
+
+        Returns
+        -------
+        fingerprint : bytes
+            Digest of the sequence of structural edits.
+
+        """
+        return self._structure.digest()
 
     def list_nodes(self):
         """List all the nodes present in the database.
@@ -594,6 +976,10 @@ class TaskDatabase(Atom):
         """Method used to reach a node specified by a path.
 
         """
+        node = self._nodes_index.get(path)
+        if node is not None:
+            return node
+
         node = self._database
         if path == 'root':
             return node
@@ -617,6 +1003,8 @@ class TaskDatabase(Atom):
                         {}'.format(path, key, keys[ind-1])
                 raise KeyError(err_str)
 
+        if isinstance(node, DatabaseNode):
+            self._nodes_index[path] = node
         return node
 
     # =========================================================================
@@ -630,11 +1018,176 @@ class TaskDatabase(Atom):
     #: issues.
     _flat_database = List()
 
-    #: Dict mapping full paths to flat database indexes.
-    _entry_index_map = Dict()
+    #: Full path of the entry stored at each index of the flat database.
+    #: Shared with the databases using the same cached layout, hence a Value
+    #: (a List would copy it) which is never modified in place.
+    _flat_paths = Value(factory=list)
+
+    #: Dict mapping full paths to flat database indexes. Shared like
+    #: _flat_paths.
+    _entry_index_map = Value(factory=dict)
+
+    #: Locks protecting the entries updated by transactions and the notified
+    #: or recorded entries in running mode. The entry at index i is protected
+    #: by the lock i % LOCK_STRIPES. They are reentrant so that observers can
+    #: write into the database.
+    _stripes = List()
+
+    #: Lock protecting the update of the state of the transactions.
+    _transactions_lock = Value()
+
+    #: Tuple (number of started transactions, number of transactions in
+    #: progress). It is replaced each time a transaction starts or ends, so
+    #: that readers can detect a concurrent transaction by identity.
+    _transactions_state = Value((0, 0))
+
+    #: Flags for each index of the flat database indicating whether updates
+    #: should be notified (NOTIFY_FLAG) and recorded (HISTORY_FLAG).
+    _flags = Typed(bytearray, ())
+
+    #: History of the values of the entries, keyed by index.
+    _histories = Dict()
+
+    #: Running digest of the structural edits done on the database.
+    _structure = Value(factory=lambda: blake2b(digest_size=16))
+
+    #: Nodes already reached through go_to_path, keyed by path.
+    _nodes_index = Dict()
+
+    #: Entries accessible from the nodes already queried, keyed by path. Each
+    #: value is a tuple (set of all the entries, sorted list of the entries
+    #: which are not excluded).
+    _accessible_cache = Dict()
+
+    def _post_setattr_excluded(self, old, new):
+        """Discard the listed accessible entries.
+
+        """
+        self._accessible_cache = {}
+
+    def _accessible_entries(self, node_path):
+        """Collect the entries accessible from a node, using the cache.
 
-    #: Lock to make the database thread safe in running mode.
-    _lock = Value()
+        """
+        cache = self._accessible_cache
+        if node_path in cache:
+            return cache[node_path]
+
+        node = self.go_to_path(node_path)
+        if node.parent is None:
+            entries = set()
+        else:
+            parent_path = node_path.rpartition('/')[0]
+            entries = set(self._accessible_entries(parent_path)[0])
+        entries.update(k for k, v in node.data.items()
+                       if not isinstance(v, DatabaseNode))
+        entries.update(node.meta.get('access', ()))
+
+        cached = (entries, sorted(entries.difference(self.excluded)))
+        cache[node_path] = cached
+        return cached
+
+    def _invalidate_entries(self, node_path):
+        """Discard the accessible entries of a node and of its descendants.
+
+        """
+        _drop_subtree(self._accessible_cache, node_path)
+
+    def _invalidate_nodes(self, node_path):
+        """Discard all cached informations about a node and its descendants.
+
+        """
+        _drop_subtree(self._nodes_index, node_path)
+        _drop_subtree(self._accessible_cache, node_path)
+
+    def _record_structure(self, *edit):
+        """Update the structural fingerprint with an edit.
+
+        """
+        self._structure.update(repr(edit).encode('utf-8'))
+
+    def _gather_values(self):
+        """Collect the values of the entries in the flat database order.
+
+        """
+        nodes = [self._database]
+        datas = []
+        for node in nodes:
+            for val in node.data.values():
+                if isinstance(val, DatabaseNode):
+                    nodes.append(val)
+                else:
+                    datas.append(val)
+        return datas
+
+    def _begin_transaction(self):
+        """Mark a transaction as in progress.
+
+        """
+        with self._transactions_lock:
+            started, active = self._transactions_state
+            self._transactions_state = (started + 1, active + 1)
+
+    def _end_transaction(self):
+        """Mark a transaction as complete.
+
+        """
+        with self._transactions_lock:
+            started, active = self._transactions_state
+            self._transactions_state = (started, active - 1)
+
+    def _write_tracked(self, index, value, flags):
+        """Write an entry whose updates are notified or recorded.
+
+        """
+        with self._stripes[index % LOCK_STRIPES]:
+            self._flat_database[index] = value
+            if flags & HISTORY_FLAG:
+                self._histories[index].append(value)
+            if flags & NOTIFY_FLAG:
+                self.notifier((self._flat_paths[index], value))
+
+    def _locked_read(self, indexes):
+        """Read several entries while holding the locks protecting them.
+
+        """
+        stripes = self._stripes
+        locks = [stripes[i]
+                 for i in sorted({index % LOCK_STRIPES for index in indexes})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            flat = self._flat_database
+            return [flat[i] for i in indexes]
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _post_setattr_observed_entries(self, old, new):
+        """Update the notified entries.
+
+        The recorded histories are preserved.
+
+        """
+        self._update_notified()
+
+    def _update_notified(self):
+        """Build the flags indicating which entries should be notified.
+
+        """
+        size = len(self._flat_database)
+        observed = self.observed_entries
+        if observed is None:
+            flags = bytearray([NOTIFY_FLAG])*size
+        else:
+            flags = bytearray(size)
+            mapping = self._entry_index_map
+            for path in observed:
+                if path in mapping:
+                    flags[mapping[path]] = NOTIFY_FLAG
+        for index in self._histories:
+            flags[index] |= HISTORY_FLAG
+        self._flags = flags
 
     def _find_index(self, assumed_path, entry):
         """Find the index associated with a path.
@@ -655,3 +1208,155 @@ class TaskDatabase(Atom):
 
         raise KeyError("Can't find entry matching {}, {}".format(assumed_path,
                        entry))
+
+
+class EntryHistory(Atom):
+    """Ring buffer storing the last values written in an entry.
+
+    Each value is stored twice (at i and i + size) in a buffer of twice the
+    size, so that the last values can always be accessed as a contiguous view
+    in chronological order. The buffer is allocated on the first write, using
+    the shape and type of the first value. It is reallocated if a later value
+    does not fit : with a wider type if possible, otherwise as an array of
+    objects. Recording a value never fails.
+
+    """
+    #: Maximal number of values kept.
+    size = Int()
+
+    #: Total number of values appended.
+    count = Int()
+
+    def append(self, value):
+        """Record a new value.
+
+        """
+        size = self.size
+        i = self.count % size
+        try:
+            buf = self._fitting_buffer(value)
+            buf[i] = value
+            buf[i + size] = value
+        except Exception:
+            buf = self._reallocate(np.dtype(object))
+            buf[i] = value
+            buf[i + size] = value
+        self.count += 1
+
+    def view(self):
+        """Get a read-only view of the recorded values, oldest first.
+
+        """
+        buf = self._buffer
+        if buf is None:
+            return np.empty(0)
+        count = self.count
+        size = self.size
+        if count <= size:
+            view = buf[:count]
+        else:
+            start = count % size
+            view = buf[start:start + size]
+        view.flags.writeable = False
+        return view
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Buffer storing the values (allocated on first write).
+    _buffer = Value()
+
+    def _fitting_buffer(self, value):
+        """Get a buffer able to store the value, reallocating it if needed.
+
+        """
+        buf = self._buffer
+        if buf is not None and buf.dtype == object and buf.ndim == 1:
+            return buf
+
+        array = np.asarray(value)
+        if buf is None:
+            buf = np.empty((2*self.size,) + array.shape, array.dtype)
+            self._buffer = buf
+        elif array.shape != buf.shape[1:]:
+            buf = self._reallocate(np.dtype(object))
+        elif not np.can_cast(array.dtype, buf.dtype):
+            buf = self._reallocate(_promote(buf.dtype, array.dtype))
+        return buf
+
+    def _reallocate(self, dtype):
+        """Copy the recorded values in a new buffer of the given type.
+
+        Values of an object buffer are stored as individual objects.
+
+        """
+        old = self._buffer
+        if dtype == object:
+            buf = np.empty(2*self.size, object)
+            if old is not None:
+                for i in range(min(self.count, self.size)):
+                    buf[i] = old[i]
+                    buf[i + self.size] = old[i + self.size]
+        else:
+            buf = old.astype(dtype)
+        self._buffer = buf
+        return buf
+
+
+class DatabaseSnapshot(Atom):
+    """Copy of the values of a running database at a given time.
+
+    Use TaskDatabase.snapshot to create one. The paths and the index map are
+    shared with the database as they do not change in running mode.
+
+    """
+    #: Values of the entries, in the order of the flat database.
+    values = Value(factory=list)
+
+    #: Full path of the entry stored at each index.
+    paths = Value(factory=list)
+
+    #: Mapping between the paths (including access exceptions) and indexes.
+    index_map = Value(factory=dict)
+
+    def get_value(self, path):
+        """Get the value of an entry from its path.
+
+        """
+        return self.values[self.index_map[path]]
+
+    def to_dict(self):
+        """Build a dictionary mapping the full path of each entry to its value.
+
+        """
+        return dict(zip(self.paths, self.values))
+
+
+class DatabaseTransaction(Atom):
+    """Buffer of database writes applied at once.
+
+    Use TaskDatabase.transaction to create one.
+
+    """
+    #: Reference to the database in which to write.
+    database = Typed(TaskDatabase)
+
+    #: List of buffered (index, value) updates.
+    updates = List()
+
+    def set_value(self, node_path, value_name, value):
+        """Set the value of an entry (see TaskDatabase.set_value).
+
+        """
+        database = self.database
+        if database.running:
+            index = database._entry_index_map[node_path + '/' + value_name]
+            self.updates.append((index, value))
+            return False
+        return database.set_value(node_path, value_name, value)
+
+    def set_value_by_index(self, index, value):
+        """Set the value of an entry using its index in the flat database.
+
+        """
+        self.updates.append((index, value))
+        return False
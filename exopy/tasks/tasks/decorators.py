@@ -13,9 +13,9 @@ ressources can be shared and how preferences are handled.
 
 """
 import logging
-from functools import update_wrapper
-from time import sleep
-from threading import Thread, Event, current_thread
+from functools import update_wrapper, partial
+from time import perf_counter
+from threading import current_thread
 
 from atom.api import Atom, Value, Callable, Str
 
@@ -46,44 +46,146 @@ def handle_stop_pause(root):
 
     pause_flag = root.should_pause
     if pause_flag.is_set():
-        root.resumed.clear()
-        root.paused_threads_counter.increment()
-        while True:
-            sleep(0.05)
-            if stop_flag.is_set():
+        tracer = root.tracer
+        if tracer is not None:
+            with tracer.span(root.name, 'pause'):
+                return _wait_for_resume(root)
+        return _wait_for_resume(root)
+
+
+def _wait_for_resume(root):
+    """Block the current thread until the measurement is resumed or stopped.
+
+    """
+    stop_flag = root.should_stop
+    pause_flag = root.should_pause
+    root.resumed.clear()
+    root.paused_threads_counter.increment()
+    resume_flag = root.should_resume
+    while True:
+        # Block until we are asked to resume (or stop). If no resume
+        # event was provided (or if it was not cleared when pausing) fall
+        # back to polling the pause flag.
+        if resume_flag is not None and not resume_flag.is_set():
+            resume_flag.wait()
+        else:
+            stop_flag.wait(0.05)
+        if stop_flag.is_set():
+            root.paused_threads_counter.decrement()
+            return True
+        if not pause_flag.is_set():
+            if current_thread().ident == root.thread_id:
+                # Prevent issues if a user alter a resource while in pause.
+                for _, resource in root.resources.items():
+                    resource.reset()
+                root.resumed.set()
                 root.paused_threads_counter.decrement()
-                return True
-            if not pause_flag.is_set():
-                if current_thread().ident == root.thread_id:
-                    # Prevent issues if a user alter a resource while in pause.
-                    for _, resource in root.resources.items():
-                        resource.reset()
-                    root.resumed.set()
-                    root.paused_threads_counter.decrement()
-                    break
-                else:
-                    # Safety here ensuring the main thread finished
-                    # re-initializing the resources.
-                    root.resumed.wait()
-                    root.paused_threads_counter.decrement()
-                    break
-
-
-def make_stoppable(function_to_decorate):
+                break
+            else:
+                # Safety here ensuring the main thread finished
+                # re-initializing the resources.
+                root.resumed.wait()
+                root.paused_threads_counter.decrement()
+                break
+
+
+def make_stop_pause_checker(root, iterations=0, period=0.0):
+    """Build a function handling the stop and pause only from time to time.
+
+    Checking the state of the inter-process events has a cost which may be
+    significant in tight loops. The returned function calls handle_stop_pause
+    only once every `iterations` calls or once every `period` seconds
+    (whichever comes first). The first call always performs the check and
+    when neither criterion is set every call performs it.
+
+    Parameters
+    ----------
+    root : RootTask
+        RootTask of the hierarchy.
+
+    iterations : int, optional
+        Number of calls between two checks. Values smaller than 1 disable
+        this criterion, which is the default.
+
+    period : float, optional
+        Minimal time in seconds between two checks. Values smaller or equal
+        to 0 disable this criterion.
+
+    Returns
+    -------
+    checker : callable
+        Function taking no argument and returning the same value as
+        handle_stop_pause when the check is performed and None otherwise.
+
+    """
+    if iterations < 1 and period <= 0:
+        iterations = 1
+    if iterations == 1:
+        return partial(handle_stop_pause, root)
+
+    iterations = iterations if iterations > 0 else float('inf')
+    count = iterations
+    deadline = 0.0
+
+    def checker():
+        """Check for stop/pause if enough calls were made or time elapsed.
+
+        """
+        nonlocal count, deadline
+        count += 1
+        if count < iterations and (period <= 0 or perf_counter() < deadline):
+            return None
+
+        count = 0
+        if period > 0:
+            deadline = perf_counter() + period
+        return handle_stop_pause(root)
+
+    return checker
+
+
+def make_stoppable(function_to_decorate, root=None):
     """Decorator allowing to stop or pause at the beginning of a task.
 
     This is applied the perform method of every task marked as stoppable. This
     check is performed before dealing with parallelism or waiting.
 
+    Parameters
+    ----------
+    function_to_decorate : callable
+        Perform method of the task.
+
+    root : RootTask, optional
+        Root of the hierarchy. When provided, the stop and pause events are
+        looked up once and the pause is handled only when one of them is set.
+        Otherwise (or if the events are not yet known) the root of the task
+        is used at each call.
+
     """
-    def decorator(*args, **kwargs):
-        """Wrap function to check for stop/pause condition.
+    if (root is None or root.should_stop is None or
+            root.should_pause is None):
+        def decorator(*args, **kwargs):
+            """Wrap function to check for stop/pause condition.
 
-        """
-        if handle_stop_pause(args[0].root):
-            return
+            """
+            if handle_stop_pause(args[0].root):
+                return
+
+            return function_to_decorate(*args, **kwargs)
+
+    else:
+        stop_is_set = root.should_stop.is_set
+        pause_is_set = root.should_pause.is_set
+
+        def decorator(*args, **kwargs):
+            """Wrap function to check for stop/pause condition.
 
-        return function_to_decorate(*args, **kwargs)
+            """
+            if ((stop_is_set() or pause_is_set()) and
+                    handle_stop_pause(root)):
+                return
+
+            return function_to_decorate(*args, **kwargs)
 
     update_wrapper(decorator, function_to_decorate)
 
@@ -116,70 +218,58 @@ def smooth_crash(function_to_decorate):
 
 
 class ThreadDispatcher(Atom):
-    """Dispatch calling a function to a thread.
+    """Dispatch calling a function to the executor of a pool.
 
-    """
-
-    #: Flag set when the thread is ready to accept new jobs.
-    inactive = Value(factory=Event)
+    A dispatcher never runs two calls concurrently: a new dispatch waits for
+    the previous call to complete. Calls dispatched from a thread of a bounded
+    pool to the same pool are run inline, as the pool may have no thread left
+    to run them.
 
+    """
     def __init__(self, perform, pool):
         self._func = smooth_crash(perform)
         self._pool = pool
-        self.inactive.set()
 
     def dispatch(self, task, *args, **kwargs):
-        """Dispatch the work to the background thread.
+        """Dispatch the work to the executor of the pool.
 
         """
-        if self._thread is None:
-            pools = task.root.resources['threads']
-            with pools.safe_access(self._pool) as threads:
-                threads.append(self)
-            self._thread = Thread(group=None,
-                                  target=self._background_loop)
-            self._thread.start()
-
-        # Make sure the background thread is done processing the previous work.
-        self.inactive.wait()
-
-        # Mark the thread as active.
-        self.inactive.clear()
-        task.root.active_threads_counter.increment()
-        pools = task.root.resources['active_threads']
-        with pools.safe_access(self._pool) as threads:
-            threads.append(self)
-
-        # Pass the arguments
-        self._args_kwargs = task, args, kwargs
-        self._new_args.set()
-
-    def stop(self):
-        """Stop the background thread.
-
-        """
-        if self._thread is None:
+        # Make sure the previous work is done.
+        future = self._future
+        if future is not None:
+            tracer = task.root.tracer
+            if tracer is not None and not future.done():
+                with tracer.span(task.path + '/' + task.name, 'dispatch'):
+                    future.result()
+            else:
+                future.result()
+
+        root = task.root
+        resources = root.resources
+        threads = resources['threads']
+        if threads.in_bounded_pool(self._pool):
+            # The current thread is already counted as active.
+            self._future = None
+            self._func(task, *args, **kwargs)
             return
 
-        while self._new_args.is_set():
-            sleep(1e-3)
-        self.inactive.wait()
-        self._args_kwargs = (None, None, None)
-        self._new_args.set()
-        self._thread.join()
-        del self._thread
-        self.inactive.set()
+        # Count the work as active before submitting, so that it is accounted
+        # for while queued (when pausing) and that tasks waiting on the pool
+        # cannot miss it.
+        root.active_threads_counter.increment()
+        resources['active_threads'].add(self._pool, self)
+        try:
+            executor = threads.get_executor(self._pool)
+            self._future = executor.submit(self._run, task, args, kwargs)
+        except Exception:
+            root.active_threads_counter.decrement()
+            resources['active_threads'].remove(self._pool, self)
+            raise
 
     # --- Private API ---------------------------------------------------------
 
-    #: Thread to which the work is dispatched.
-    _thread = Value()
-
-    #: Flag set when the new arguments are available..
-    _new_args = Value(factory=Event)
-
-    #: Arguments and keywords arguments for the next dispatch.
-    _args_kwargs = Value()
+    #: Future corresponding to the last dispatched work.
+    _future = Value()
 
     #: Reference to the function to call on each dispatch.
     _func = Callable()
@@ -187,26 +277,28 @@ class ThreadDispatcher(Atom):
     #: Pool id to which this dispatcher belongs.
     _pool = Str()
 
-    def _background_loop(self):
-        """Background function executed by the thread.
+    def _run(self, task, args, kwargs):
+        """Function executed by the executor thread.
 
         """
-        while True:
-            self._new_args.wait()
-            task, args, kwargs = self._args_kwargs
-            if task is None:
-                break
+        root = task.root
+        tracer = root.tracer
+        if tracer is not None:
+            tracer.begin(self._pool, 'pool')
+        try:
             self._func(task, *args, **kwargs)
-            self._new_args.clear()
-            self.inactive.set()
-            task.root.active_threads_counter.decrement()
+        finally:
+            if tracer is not None:
+                tracer.end(self._pool, 'pool')
+            root.active_threads_counter.decrement()
+            root.resources['active_threads'].remove(self._pool, self)
 
 
 def make_parallel(perform, pool):
     """Machinery to execute perform in parallel.
 
-    Create a wrapper around a method to execute it in a thread and register the
-    thread.
+    Create a wrapper around a method to execute it in one of the threads of
+    an execution pool.
 
     Parameters
     ----------
@@ -214,7 +306,7 @@ def make_parallel(perform, pool):
         Method which should be wrapped to run in parallel.
 
     pool : str
-        Name of the execution pool to which the created thread belongs.
+        Name of the execution pool in which to run the method.
 
     """
     dispatcher = ThreadDispatcher(perform, pool)
@@ -226,7 +318,85 @@ def make_parallel(perform, pool):
     return wrapper
 
 
-def make_wait(perform, wait, no_wait):
+def make_process(perform, pool):
+    """Machinery to execute perform in a worker process.
+
+    The task is rebuilt from its preferences in a worker process of the
+    execution pool, along with the values of the database entries it
+    references. Once perform has completed, the values of the task entries
+    are written back into the database. This should be combined with
+    make_parallel so that the calling thread is not blocked.
+
+    Only simple tasks which do not rely on the resources of the measurement
+    (instruments, files, ...) can be executed this way.
+
+    Parameters
+    ----------
+    perform : method
+        Method which should be executed in a worker process. The method of
+        the class of the task is called in the worker.
+
+    pool : str
+        Name of the execution pool in which to run the method.
+
+    """
+    def wrapper(obj, *args, **kwargs):
+        """Ship the task to a worker process and collect its outputs.
+
+        """
+        executor = obj.root.resources['processes'].get_executor(pool)
+
+        obj.update_preferences_from_members()
+        dependencies = {}
+        for component in obj.traverse():
+            key = getattr(component, 'interface_id', None)
+            if key is None:
+                key = component.task_id
+            deps = dependencies.setdefault(component.dep_type, {})
+            deps[key] = type(component)
+
+        inputs = {}
+        for name in obj._list_referenced_entries():
+            try:
+                inputs[name] = obj.get_from_database(name)
+            except KeyError:
+                pass
+
+        future = executor.submit(_perform_in_process, type(obj),
+                                 obj.preferences.dict(), dependencies,
+                                 inputs, perform.__name__, args, kwargs)
+        for entry, value in future.result().items():
+            obj.write_in_database(entry, value)
+
+    update_wrapper(wrapper, perform)
+    return wrapper
+
+
+def _perform_in_process(task_class, config, dependencies, inputs, method,
+                        args, kwargs):
+    """Rebuild a task in a worker process, perform it and return its entries.
+
+    """
+    from .base_tasks import RootTask
+
+    root = RootTask()
+    task = task_class.build_from_config(config, dependencies)
+    root.add_child_task(0, task)
+    for name, value in inputs.items():
+        root.write_in_database(name, value)
+
+    root.database.prepare_to_run()
+    task.prepare()
+    try:
+        getattr(task, method)(*args, **kwargs)
+    finally:
+        root.release_resources()
+
+    return {entry: task.get_from_database(task._task_entry(entry))
+            for entry in task.database_entries}
+
+
+def make_wait(perform, wait, no_wait, tracer=None):
     """Machinery to make perform wait on other tasks execution.
 
     Create a wrapper around a method to wait for some threads to terminate
@@ -248,6 +418,9 @@ def make_wait(perform, wait, no_wait):
     execution will be deffered till all the execution pools have completed
     their works.
 
+    tracer : TraceRecorder, optional
+        Recorder in which to store the time spent waiting.
+
     """
     if wait:
         def get_pools(active_threads):
@@ -276,33 +449,12 @@ def make_wait(perform, wait, no_wait):
         """Wrap function to wait upon specified pools.
 
         """
-        all_threads = obj.root.resources['active_threads']
-        while True:
-            threads = []
-            # Get all the pools we should be operating on.
-            pools = get_pools(all_threads)
-
-            # Get all the threads we should be operating upon.
-            with all_threads.locked():
-                for p in pools:
-                    threads.extend(all_threads[p])
-
-            # If there is none break. Use any as threads is an iterator.
-            if not any(threads):
-                break
-
-            # Else join them.
-            for thread in threads:
-                thread.inactive.wait()
-
-            # Make sure nobody modify the pools and update them by removing
-            # the references to the dead threads.
-            with all_threads.locked():
-                for p in pools:
-                    all_threads[p] = [t for t in all_threads[p]
-                                      if not t.inactive.is_set()]
-
-            # Start over till no thread remain in the pools in wait.
+        active_threads = obj.root.resources['active_threads']
+        if tracer is not None:
+            with tracer.span(obj.path + '/' + obj.name, 'wait'):
+                active_threads.wait_for_pools(get_pools)
+        else:
+            active_threads.wait_for_pools(get_pools)
 
         return perform(obj, *args, **kwargs)
 
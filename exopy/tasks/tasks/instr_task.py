@@ -120,9 +120,16 @@ class InstrumentTask(SimpleTask):
             profile = run_time[PROFILE_DEPENDENCY_ID][p_id]
             d_cls, starter = run_time[DRIVER_DEPENDENCY_ID][d_id]
             # Profile do not always contain a settings.
-            self.driver = starter.start(d_cls,
-                                        profile['connections'][c_id],
-                                        profile['settings'].get(s_id, {}))
+            tracer = self.root.tracer
+            if tracer is not None:
+                tracer.begin(d_id, 'driver')
+            try:
+                self.driver = starter.start(d_cls,
+                                            profile['connections'][c_id],
+                                            profile['settings'].get(s_id, {}))
+            finally:
+                if tracer is not None:
+                    tracer.end(d_id, 'driver')
             # HINT allow something dangerous as the same instrument can be
             # accessed using multiple settings.
             # User should be careful about this (and should be warned)
@@ -27,5 +27,5 @@ class ConditionalTask(ComplexTask):
 
         """
         if self.format_and_eval_string(self.condition):
-            for child in self.children:
-                child.perform_()
+            for perform in self._execution_plan():
+                perform()
@@ -13,7 +13,7 @@ import numbers
 from decimal import Decimal
 
 import numpy as np
-from atom.api import Str, Int
+from atom.api import Str, Value
 
 from ..task_interface import TaskInterface
 from ..validators import Feval
@@ -59,14 +59,14 @@ class GeomspaceLoopInterface(TaskInterface):
         """Build the arange and pass it to the LoopTask.
 
         """
-        task = self.task
-        iterable = self.generate_geomspace_array()
-        task.write_in_database('loop_values', np.array(iterable))
-        task.perform_loop(iterable)
-    
+        self.task.perform_loop(self.generate_geomspace_array())
+
     def generate_geomspace_array(self):
         """Helper function for generating the geomspace array
-        
+
+        The array is only rebuilt if the parameters changed since the last
+        call and is read-only.
+
         """
         task = self.task
 
@@ -74,16 +74,27 @@ class GeomspaceLoopInterface(TaskInterface):
         stop = task.format_and_eval_string(self.stop)
         num = task.format_and_eval_string(self.num)
 
-        # determine rounding from user input.   
+        key = (str(start), str(stop), num)
+        if self._cached_array and self._cached_array[0] == key:
+            return self._cached_array[1]
+
+        # determine rounding from user input.
         stop_digit = abs(Decimal(str(stop)).as_tuple().exponent)
         start_digit = abs(Decimal(str(start)).as_tuple().exponent)
         digit = max((start_digit, stop_digit))
 
         # Round values to the maximal number of digit used in start and stop
         # so that we never get issues with floating point rounding issues.
-        raw_values = np.geomspace(start, stop, num)
-        array = np.fromiter((round(value, digit)
-                                for value in raw_values),
-                               np.float64, len(raw_values))
+        array = np.round(np.geomspace(start, stop, num, dtype=np.float64),
+                         digit)
+        array.flags.writeable = False
+        self._cached_array = (key, array)
 
         return array
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    #: Last parameters used to build the loop array and the (read-only) array.
+    _cached_array = Value()
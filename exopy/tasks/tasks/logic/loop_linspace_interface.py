@@ -13,7 +13,7 @@ import numbers
 from decimal import Decimal
 
 import numpy as np
-from atom.api import Str
+from atom.api import Str, Value
 
 from ..task_interface import TaskInterface
 from ..validators import Feval
@@ -77,6 +77,28 @@ class LinspaceLoopInterface(TaskInterface):
         stop = task.format_and_eval_string(self.stop)
         step = task.format_and_eval_string(self.step)
 
+        # The array is only rebuilt if the parameters changed since the last
+        # execution (as can happen in nested loops).
+        key = (str(start), str(stop), str(step))
+        if self._cached_array and self._cached_array[0] == key:
+            iterable = self._cached_array[1]
+        else:
+            iterable = self._generate_linspace_array(start, stop, step)
+            self._cached_array = (key, iterable)
+
+        task.perform_loop(iterable)
+
+    # =========================================================================
+    # --- Private API ---------------------------------------------------------
+    # =========================================================================
+
+    #: Last parameters used to build the loop array and the (read-only) array.
+    _cached_array = Value()
+
+    def _generate_linspace_array(self, start, stop, step):
+        """Build the array of the loop values rounding them appropriately.
+
+        """
         # Make sure the sign of the step makes sense.
         step = -abs(step) if start > stop else abs(step)
 
@@ -94,9 +116,7 @@ class LinspaceLoopInterface(TaskInterface):
         # Round values to the maximal number of digit used in start, stop and
         # step so that we never get issues with floating point rounding issues.
         # The max is used to allow from 1.01 to 2.01 by 0.1
-        raw_values = np.linspace(start, stop, num)
-        iterable = np.fromiter((round(value, digit)
-                                for value in raw_values),
-                               np.float64, len(raw_values))
-        task.write_in_database('loop_values', np.array(iterable))
-        task.perform_loop(iterable)
+        array = np.round(np.linspace(start, stop, num, dtype=np.float64),
+                         digit)
+        array.flags.writeable = False
+        return array
@@ -11,13 +11,13 @@
 """
 import numpy as np
 
-from atom.api import (Typed, Bool, set_default)
+from atom.api import (Typed, Bool, Int, Float, Value, set_default)
 
 from timeit import default_timer
 
 from ..base_tasks import (SimpleTask, ComplexTask)
 from ..task_interface import InterfaceableTaskMixin
-from ..decorators import handle_stop_pause
+from ..decorators import make_stop_pause_checker
 from .loop_exceptions import BreakException, ContinueException
 
 
@@ -28,6 +28,16 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
     #: Flag indicating whether or not to time the loop.
     timing = Bool().tag(pref=True)
 
+    #: Number of iterations between two checks of the stop and pause
+    #: requests. Checking less often reduces the overhead of tight loops. 0
+    #: means that only the period is considered. When neither is set, the
+    #: requests are checked at each iteration.
+    stop_check_iterations = Int(0).tag(pref=True)
+
+    #: Minimal time in seconds between two checks of the stop and pause
+    #: requests. 0 means that only the number of iterations is considered.
+    stop_check_period = Float(0.0).tag(pref=True)
+
     #: Task to call before other child tasks with current loop value. This task
     #: is simply a convenience and can be set to None.
     task = Typed(SimpleTask).tag(child=50)
@@ -54,6 +64,15 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
 
         return test, traceback
 
+    def prepare(self):
+        """Forget the iterable of any previous execution and collect the
+        entries whose history this loop should record.
+
+        """
+        super(LoopTask, self).prepare()
+        self._last_iterable = None
+        self._history_paths = self._list_history_paths()
+
     def perform_loop(self, iterable):
         """Perform the loop on the iterable calling all child tasks at each
         iteration.
@@ -66,6 +85,13 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
             Iterable on which the loop should be performed.
 
         """
+        self._update_loop_values(iterable)
+
+        if self._history_paths:
+            database = self.database
+            for path in self._history_paths:
+                database.enable_history(path, len(iterable))
+
         if self.timing:
             if self.task:
                 self._perform_loop_timing_task(iterable)
@@ -81,24 +107,107 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
     # --- Private API ---------------------------------------------------------
     # =========================================================================
 
-    def _perform_loop(self, iterable):
-        """Perform the loop when there is no child and timing is not required.
+    #: Last iterable used for the loop if it cannot be modified in place
+    #: (range, tuple or read-only array).
+    _last_iterable = Value()
+
+    #: Paths of the entries whose history is recorded by this loop.
+    _history_paths = Value(())
+
+    def _list_history_paths(self):
+        """List the entries whose history should be recorded by this loop.
+
+        Those are the history entries of this loop and of the tasks for which
+        this loop is the closest enclosing loop.
+
+        """
+        paths = []
+        tasks = [self]
+        while tasks:
+            task = tasks.pop()
+            # Nested loops record the history of their own entries.
+            if isinstance(task, LoopTask) and task is not self:
+                continue
+            paths.extend(task.path + '/' + task._task_entry(e)
+                         for e in task.history_entries
+                         if e in task.database_entries)
+            tasks.extend(getattr(task, 'children', ()))
+            if task is self and task.task:
+                tasks.append(task.task)
+        return paths
+
+    def _update_loop_values(self, iterable):
+        """Update the point number and the loop values in the database.
+
+        Nothing is done if the iterable is the same immutable object as for
+        the previous execution (as can happen in nested loops).
 
         """
+        if iterable is self._last_iterable:
+            return
+
         self.write_in_database('point_number', len(iterable))
-        self.write_in_database('loop_values', np.array(iterable))
+        if isinstance(iterable, np.ndarray) and not iterable.flags.writeable:
+            self._last_iterable = iterable
+            self.write_in_database('loop_values', iterable)
+        else:
+            immutable = isinstance(iterable, (range, tuple))
+            self._last_iterable = iterable if immutable else None
+            self.write_in_database('loop_values', np.array(iterable))
+
+    def _make_stop_pause_checker(self):
+        """Build the function used to check for stop/pause at each iteration.
 
-        root = self.root
+        """
+        return make_stop_pause_checker(self.root, self.stop_check_iterations,
+                                       self.stop_check_period)
+
+    def _make_values_writer(self):
+        """Build the function writing the index and value of an iteration.
+
+        When the entries have been resolved, both values are written in a
+        single update of their slots in the flat database if one of them is
+        notified or recorded, and using plain indexed stores otherwise. The
+        check is done at each iteration as the observed entries can change
+        during the measurement.
+
+        """
+        indexes = self._entries_indexes
+        if 'index' not in indexes or 'value' not in indexes:
+            def write_values(index, value):
+                self.write_values_in_database({'index': index, 'value': value})
+            return write_values
+
+        database = self.database
+        is_tracked = database.is_tracked
+        set_value = database.set_value_by_index
+        set_values = database.set_values_by_index
+        index_slot, value_slot = indexes['index'], indexes['value']
+
+        def write_values(index, value):
+            if is_tracked(index_slot) or is_tracked(value_slot):
+                set_values([(index_slot, index), (value_slot, value)])
+            else:
+                set_value(index_slot, index)
+                set_value(value_slot, value)
+        return write_values
+
+    def _perform_loop(self, iterable):
+        """Perform the loop when there is no child and timing is not required.
+
+        """
+        check_stop_pause = self._make_stop_pause_checker()
+        write_values = self._make_values_writer()
+        plan = self._execution_plan()
         for i, value in enumerate(iterable):
 
-            if handle_stop_pause(root):
+            if check_stop_pause():
                 return
 
-            self.write_in_database('index', i+1)
-            self.write_in_database('value', value)
+            write_values(i+1, value)
             try:
-                for child in self.children:
-                    child.perform_()
+                for perform in plan:
+                    perform()
             except BreakException:
                 break
             except ContinueException:
@@ -108,20 +217,18 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
         """Perform the loop when there is a child and timing is not required.
 
         """
-        self.write_in_database('point_number', len(iterable))
-        self.write_in_database('loop_values', np.array(iterable))
-
-        root = self.root
+        check_stop_pause = self._make_stop_pause_checker()
+        plan = self._execution_plan()
         for i, value in enumerate(iterable):
 
-            if handle_stop_pause(root):
+            if check_stop_pause():
                 return
 
             self.write_in_database('index', i+1)
             self.task.perform_(value)
             try:
-                for child in self.children:
-                    child.perform_()
+                for perform in plan:
+                    perform()
             except BreakException:
                 break
             except ContinueException:
@@ -131,21 +238,19 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
         """Perform the loop when there is no child and timing is required.
 
         """
-        self.write_in_database('point_number', len(iterable))
-        self.write_in_database('loop_values', np.array(iterable))
-
-        root = self.root
+        check_stop_pause = self._make_stop_pause_checker()
+        write_values = self._make_values_writer()
+        plan = self._execution_plan()
         for i, value in enumerate(iterable):
 
-            if handle_stop_pause(root):
+            if check_stop_pause():
                 return
 
-            self.write_in_database('index', i+1)
-            self.write_in_database('value', value)
+            write_values(i+1, value)
             tic = default_timer()
             try:
-                for child in self.children:
-                    child.perform_()
+                for perform in plan:
+                    perform()
             except BreakException:
                 self.write_in_database('elapsed_time', default_timer()-tic)
                 break
@@ -158,21 +263,19 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
         """Perform the loop when there is a child and timing is required.
 
         """
-        self.write_in_database('point_number', len(iterable))
-        self.write_in_database('loop_values', np.array(iterable))
-
-        root = self.root
+        check_stop_pause = self._make_stop_pause_checker()
+        plan = self._execution_plan()
         for i, value in enumerate(iterable):
 
-            if handle_stop_pause(root):
+            if check_stop_pause():
                 return
 
             self.write_in_database('index', i+1)
             tic = default_timer()
             self.task.perform_(value)
             try:
-                for child in self.children:
-                    child.perform_()
+                for perform in plan:
+                    perform()
             except BreakException:
                 self.write_in_database('elapsed_time', default_timer()-tic)
                 break
@@ -34,6 +34,7 @@ class WhileTask(ComplexTask):
         """
         i = 1
         root = self.root
+        plan = self._execution_plan()
         while True:
             self.write_in_database('index', i)
             i += 1
@@ -44,8 +45,8 @@ class WhileTask(ComplexTask):
                 return
 
             try:
-                for child in self.children:
-                    child.perform_()
+                for perform in plan:
+                    perform()
             except BreakException:
                 break
             except ContinueException:
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright 2015-2018 by Exopy Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Lightweight instrumentation of the execution of the tasks.
+
+"""
+import os
+import sys
+import csv
+import json
+from contextlib import contextmanager
+from functools import update_wrapper
+from math import log10
+from threading import Lock, Thread, Event, get_ident
+from time import perf_counter
+
+from atom.api import Atom, Int, Float, Value, Dict, List
+
+
+#: Smallest duration (in s) which can be distinguished in the histograms.
+MIN_DURATION = 1e-7
+
+#: Number of bins per decade in the histograms.
+BINS_PER_DECADE = 20
+
+#: Number of bins of the histograms (covering up to 1e4 s).
+BINS_NUMBER = 11 * BINS_PER_DECADE
+
+#: Percentiles included in the reports.
+PERCENTILES = (50, 90, 99)
+
+
+class TaskTimings(Atom):
+    """Timing statistics about the executions of a task.
+
+    The durations are accumulated in a preallocated histogram with
+    logarithmically spaced bins so that percentiles can be estimated without
+    storing every duration.
+
+    """
+    #: Number of recorded executions.
+    count = Int()
+
+    #: Total time spent in the task.
+    total = Float()
+
+    #: Shortest execution time.
+    min = Float(float('inf'))
+
+    #: Longest execution time.
+    max = Float()
+
+    #: Number of executions whose duration falls in each bin.
+    histogram = Value(factory=lambda: [0]*BINS_NUMBER)
+
+    def record(self, duration):
+        """Record the duration of an execution.
+
+        """
+        self.count += 1
+        self.total += duration
+        if duration < self.min:
+            self.min = duration
+        if duration > self.max:
+            self.max = duration
+
+        if duration > MIN_DURATION:
+            index = int(log10(duration/MIN_DURATION)*BINS_PER_DECADE)
+            self.histogram[min(index, BINS_NUMBER - 1)] += 1
+        else:
+            self.histogram[0] += 1
+
+    def percentile(self, percent):
+        """Estimate a percentile of the execution time.
+
+        The upper edge of the bin containing the percentile is returned
+        (clipped to the observed range).
+
+        """
+        if not self.count:
+            return 0.0
+
+        threshold = self.count*percent/100
+        cumulated = 0
+        for i, n in enumerate(self.histogram):
+            cumulated += n
+            if cumulated >= threshold:
+                break
+
+        # The last bin has no upper bound.
+        if i == BINS_NUMBER - 1:
+            return self.max
+
+        edge = MIN_DURATION*10**((i + 1)/BINS_PER_DECADE)
+        return min(max(edge, self.min), self.max)
+
+    def summary(self):
+        """Summarize the statistics in a dictionary.
+
+        """
+        if not self.count:
+            return {'count': 0}
+
+        summary = {'count': self.count, 'total': self.total,
+                   'mean': self.total/self.count, 'min': self.min,
+                   'max': self.max}
+        for p in PERCENTILES:
+            summary['p%d' % p] = self.percentile(p)
+        return summary
+
+
+class TimingsRecorder(Atom):
+    """Collect the timing statistics of all the tasks of a hierarchy.
+
+    """
+    #: Statistics of each task, keyed by the path of the task.
+    timings = Dict()
+
+    def get_timings(self, path):
+        """Get the statistics of a task, creating them if necessary.
+
+        """
+        with self._lock:
+            if path not in self.timings:
+                self.timings[path] = TaskTimings()
+            return self.timings[path]
+
+    def report(self):
+        """Summarize the statistics of all tasks.
+
+        Returns
+        -------
+        report : dict
+            Summary of the statistics of each task, keyed by the path of the
+            task.
+
+        """
+        return {path: t.summary() for path, t in self.timings.items()}
+
+    def save(self, path):
+        """Save the summary of the statistics in a csv file.
+
+        """
+        fields = (['task', 'count', 'total', 'mean', 'min', 'max'] +
+                  ['p%d' % p for p in PERCENTILES])
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fields, restval='')
+            writer.writeheader()
+            for task, summary in sorted(self.report().items()):
+                writer.writerow(dict(summary, task=task))
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Lock protecting the creation of new statistics.
+    _lock = Value(factory=Lock)
+
+
+def make_timed(perform, timings):
+    """Machinery to record the execution time of perform.
+
+    Parameters
+    ----------
+    perform : method
+        Method whose execution should be timed.
+
+    timings : TaskTimings
+        Statistics in which to record the execution times.
+
+    """
+    record = timings.record
+
+    def wrapper(*args, **kwargs):
+        """Wrap function to record its execution time.
+
+        """
+        tic = perf_counter()
+        try:
+            return perform(*args, **kwargs)
+        finally:
+            record(perf_counter() - tic)
+
+    update_wrapper(wrapper, perform)
+    return wrapper
+
+
+class TraceRecorder(Atom):
+    """Collect the events of an execution in the Chrome trace event format.
+
+    The events are buffered in memory and written at the end of the execution.
+    The resulting file can be opened in chrome://tracing or Perfetto.
+
+    """
+    #: Buffered events. Appending to a list being atomic the events can be
+    #: recorded from any thread without locking.
+    events = List()
+
+    def begin(self, name, category):
+        """Record the beginning of a span in the current thread.
+
+        """
+        self.events.append((name, category, 'B', perf_counter(), get_ident()))
+
+    def end(self, name, category):
+        """Record the end of a span in the current thread.
+
+        """
+        self.events.append((name, category, 'E', perf_counter(), get_ident()))
+
+    @contextmanager
+    def span(self, name, category):
+        """Record a span lasting the time the context is entered.
+
+        """
+        self.begin(name, category)
+        try:
+            yield
+        finally:
+            self.end(name, category)
+
+    def save(self, path):
+        """Save the recorded events in a json file.
+
+        """
+        pid = os.getpid()
+        origin = self.events[0][3] if self.events else 0.0
+        events = [{'name': name, 'cat': cat, 'ph': ph, 'pid': pid,
+                   'tid': tid, 'ts': (ts - origin)*1e6}
+                  for name, cat, ph, ts, tid in self.events]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def make_traced(perform, tracer, name, category):
+    """Machinery to record the execution of perform as a span of a trace.
+
+    Parameters
+    ----------
+    perform : method
+        Method whose execution should be traced.
+
+    tracer : TraceRecorder
+        Recorder in which to store the events.
+
+    name : str
+        Name of the span.
+
+    category : str
+        Category of the span.
+
+    """
+    begin = tracer.begin
+    end = tracer.end
+
+    def wrapper(*args, **kwargs):
+        """Wrap function to record the beginning and end of its execution.
+
+        """
+        begin(name, category)
+        try:
+            return perform(*args, **kwargs)
+        finally:
+            end(name, category)
+
+    update_wrapper(wrapper, perform)
+    return wrapper
+
+
+class SamplingProfiler(Atom):
+    """Statistical profiler periodically sampling the stacks of all threads.
+
+    A background thread collects the current frame of every other thread at a
+    fixed rate. The stacks are aggregated in memory and can be saved in the
+    collapsed format used by flamegraph tools (one line per stack, frames
+    separated by semicolons and followed by the number of samples).
+
+    """
+    #: Number of samples to take per second.
+    rate = Float(100.0)
+
+    #: Number of samples of each stack, keyed by the collapsed stack.
+    stacks = Dict()
+
+    def start(self):
+        """Start sampling in a background thread.
+
+        """
+        self._stop_event.clear()
+        self._thread = Thread(target=self._sample, name='SamplingProfiler',
+                              daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the background thread to exit.
+
+        """
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def save(self, path):
+        """Save the aggregated stacks in the collapsed format.
+
+        """
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write('%s %d\n' % (stack, count))
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Background thread taking the samples.
+    _thread = Value()
+
+    #: Event used to ask the background thread to stop.
+    _stop_event = Value(factory=Event)
+
+    #: Cache of the formatted name of each code object.
+    _names = Dict()
+
+    def _sample(self):
+        """Sample the stacks of all threads until asked to stop.
+
+        """
+        own_id = get_ident()
+        interval = 1/self.rate if self.rate > 0 else 0.01
+        stacks = self.stacks
+        stop_wait = self._stop_event.wait
+        while not stop_wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = self._collapse(frame)
+                stacks[stack] = stacks.get(stack, 0) + 1
+
+    def _collapse(self, frame):
+        """Build the collapsed representation of the stack of a frame.
+
+        """
+        names = self._names
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            name = names.get(code)
+            if name is None:
+                name = '%s (%s:%d)' % (code.co_name,
+                                       os.path.basename(code.co_filename),
+                                       code.co_firstlineno)
+                names[code] = name
+            frames.append(name)
+            frame = frame.f_back
+        return ';'.join(reversed(frames))
@@ -9,12 +9,15 @@
 """Thread safe object to use in tasks.
 
 """
+import sys
 import logging
 from contextlib import contextmanager
 from collections import defaultdict
-from threading import RLock, Lock
+from threading import RLock, Lock, Condition, local
+from multiprocessing import get_context
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-from atom.api import Atom, Instance, Value, Int, set_default
+from atom.api import Atom, Instance, Value, Int, Dict, set_default
 
 
 class SharedCounter(Atom):
@@ -164,47 +167,189 @@ class ResourceHolder(SharedDict):
 
 
 class ThreadPoolResource(ResourceHolder):
-    """Resource holder specialized to handle threads grouped in pools.
+    """Resource holder specialized to handle the executors of the pools.
+
+    Each pool is backed by a thread pool executor created on first use.
+
+    The number of threads of a pool is not limited unless specified. As a task
+    running in a bounded pool and waiting for a task it dispatched to the same
+    pool could wait forever (all the threads of the pool being busy), the work
+    dispatched to a bounded pool by one of its own threads should be run
+    inline (see in_bounded_pool).
 
     """
     # Should always be released first. As execution may not yet be complete.
     priority = set_default(-1)
 
-    def __init__(self, default=list, **kwargs):
-        super(ThreadPoolResource, self).__init__(default, **kwargs)
+    #: Maximal number of threads used by each pool, pools not listed use
+    #: default_size.
+    pool_sizes = Dict()
+
+    #: Maximal number of threads used by a pool if not specified in
+    #: pool_sizes. 0 means that the number of threads is not limited.
+    default_size = Int()
+
+    def get_executor(self, pool):
+        """Get the executor of a pool, creating it if necessary.
+
+        """
+        with self.locked():
+            executor = self._dict.get(pool)
+            if executor is None:
+                size = self.pool_sizes.get(pool, self.default_size)
+                if size > 0:
+                    executor = ThreadPoolExecutor(size, 'exopy-pool-' + pool,
+                                                  self._mark_worker, (pool,))
+                else:
+                    executor = ThreadPoolExecutor(sys.maxsize,
+                                                  'exopy-pool-' + pool)
+                self._dict[pool] = executor
+
+        return executor
+
+    def in_bounded_pool(self, pool):
+        """Check whether the current thread is a thread of a bounded pool.
+
+        """
+        return getattr(self._workers, 'pool', None) == pool
 
     def release(self):
-        """Join all the threads still alive.
+        """Shut down all the executors once their work is done.
 
         """
         while True:
-            threads = []
-            bugged = []
+            # Executors can be created while we wait for others to complete.
             with self.locked():
-                # Get all the dispatcher we should be waiting upon.
-                for pool in self:
-                    threads.extend(self[pool])
+                executors = list(self._dict.items())
+                self._dict.clear()
 
-            # If there is none break.
-            if not any(threads):
+            if not executors:
                 break
 
-            # Else stop them.
-            for dispatcher in threads:
+            for pool, executor in executors:
                 try:
-                    dispatcher.stop()
+                    executor.shutdown()
                 except Exception:
                     log = logging.getLogger(__name__)
-                    mes = 'Failed to join thread %s from pool %s'
-                    log.exception(mes, dispatcher, pool)
-                    bugged.append(dispatcher)
+                    mes = 'Failed to shut down the executor of pool %s'
+                    log.exception(mes, pool)
 
-            # Make sure nobody modify the pools and update them by removing
-            # the references to the dead threads.
-            with self.locked():
-                for p in self:
-                    self[p] = [d for d in self[p]
-                               if d not in bugged and not d.inactive.is_set()]
+    # --- Private API ---------------------------------------------------------
+
+    #: Thread local storage holding the name of the bounded pool to which the
+    #: current thread belongs.
+    _workers = Value(factory=local)
+
+    def _mark_worker(self, pool):
+        """Record the pool to which a new thread of a bounded pool belongs.
+
+        """
+        self._workers.pool = pool
+
+
+class ProcessPoolResource(ResourceHolder):
+    """Resource holder specialized to handle the process executors of the
+    pools.
+
+    Each pool is backed by a process pool executor created on first use. The
+    worker processes are spawned so that they do not inherit the state of
+    the running measurement.
+
+    """
+    # Released after the threads which may be waiting on workers.
+    priority = set_default(0)
+
+    #: Maximal number of processes used by each pool, pools not listed use
+    #: as many processes as there are cores.
+    pool_sizes = Dict()
+
+    def get_executor(self, pool):
+        """Get the executor of a pool, creating it if necessary.
+
+        """
+        with self.locked():
+            executor = self._dict.get(pool)
+            if executor is None:
+                executor = ProcessPoolExecutor(self.pool_sizes.get(pool),
+                                               get_context('spawn'))
+                self._dict[pool] = executor
+
+        return executor
+
+    def release(self):
+        """Shut down all the executors once their work is done.
+
+        """
+        with self.locked():
+            executors = list(self._dict.items())
+            self._dict.clear()
+
+        for pool, executor in executors:
+            try:
+                executor.shutdown()
+            except Exception:
+                log = logging.getLogger(__name__)
+                mes = 'Failed to shut down the process executor of pool %s'
+                log.exception(mes, pool)
+
+
+class ActivePoolsResource(ResourceHolder):
+    """Resource holder keeping track of the dispatchers running in each pool.
+
+    Threads waiting for pools to complete their work are notified each time
+    a dispatcher completes.
+
+    """
+    def __init__(self, **kwargs):
+        super(ActivePoolsResource, self).__init__(list, **kwargs)
+        self._condition = Condition(self._lock)
+
+    def add(self, pool, dispatcher):
+        """Mark a dispatcher as active.
+
+        """
+        with self._lock:
+            self._dict[pool].append(dispatcher)
+
+    def remove(self, pool, dispatcher):
+        """Mark a dispatcher as inactive and notify waiting threads.
+
+        """
+        with self._condition:
+            self._dict[pool].remove(dispatcher)
+            self._condition.notify_all()
+
+    def wait_for_pools(self, get_pools):
+        """Wait for some pools to have no active dispatcher.
+
+        Parameters
+        ----------
+        get_pools : callable
+            Function taking this object as argument and returning the names of
+            the pools on which to wait. It is called again each time a
+            dispatcher completes.
+
+        """
+        d = self._dict
+        with self._condition:
+            self._condition.wait_for(lambda: not any(d[p]
+                                                     for p in get_pools(self)))
+
+    def release(self):
+        """Forget about all dispatchers.
+
+        The executors being released earlier, no dispatcher should remain
+        active.
+
+        """
+        with self._condition:
+            self._dict.clear()
+            self._condition.notify_all()
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Condition (sharing the instance lock) used to notify waiting threads.
+    _condition = Value()
 
 
 class InstrsResource(ResourceHolder):
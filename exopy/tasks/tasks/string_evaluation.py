@@ -12,6 +12,7 @@ The base tasks define how task interact between them and with the database, how
 ressources can be shared and how preferences are handled.
 
 """
+import ast
 from textwrap import fill
 from inspect import cleandoc
 from math import (cos, sin, tan, acos, asin, atan, sqrt, log10,
@@ -46,3 +47,86 @@ def safe_eval(expr, local_var):
 
     """
     return eval(expr, globals(), local_var)
+
+
+def compile_eval(expr, arg_names):
+    """Compile expr into a function taking the given variables as arguments.
+
+    The function is evaluated in the same namespace as the one used by
+    safe_eval, so that the same functions are available.
+
+    """
+    source = 'lambda {}: ({}\n)'.format(', '.join(arg_names), expr)
+    return eval(compile(source, '<string>', 'eval'), globals())
+
+
+#: Names which can be used in an expression without preventing its folding.
+PURE_NAMES = frozenset(('cos', 'sin', 'tan', 'acos', 'asin', 'atan', 'sqrt',
+                        'log10', 'exp', 'log', 'cosh', 'sinh', 'tanh',
+                        'atan2', 'Pi', 'abs', 'round', 'int', 'float',
+                        'complex', 'bool', 'min', 'max', 'pow', 'range'))
+
+#: Types of the values which can be folded (no mutation is possible).
+IMMUTABLE_TYPES = (int, float, complex, bool, str, bytes, range, type(None))
+
+#: Ast nodes which can appear in an expression which can be folded.
+PURE_NODES = (ast.Expression, ast.Constant, ast.UnaryOp, ast.BinOp,
+              ast.BoolOp, ast.Compare, ast.IfExp, ast.Tuple, ast.Load,
+              ast.unaryop, ast.operator, ast.boolop, ast.cmpop)
+
+
+def _is_pure(node):
+    """Check that an ast node can be evaluated once and for all.
+
+    """
+    if isinstance(node, ast.Name):
+        return node.id in PURE_NAMES
+    elif isinstance(node, ast.Attribute):
+        # Only complex math functions can be accessed.
+        return isinstance(node.value, ast.Name) and node.value.id == 'cm'
+    elif isinstance(node, ast.Call):
+        return (not node.keywords and
+                isinstance(node.func, (ast.Name, ast.Attribute)) and
+                all(_is_pure(n) for n in ast.iter_child_nodes(node)))
+    elif isinstance(node, PURE_NODES):
+        return all(_is_pure(n) for n in ast.iter_child_nodes(node))
+    return False
+
+
+def _is_immutable(value):
+    """Check that a value cannot be modified in place.
+
+    """
+    if isinstance(value, tuple):
+        return all(_is_immutable(v) for v in value)
+    return isinstance(value, IMMUTABLE_TYPES)
+
+
+def fold_constant(expr):
+    """Evaluate an expression not referencing any database entry.
+
+    Only expressions made of literals and pure functions and whose value is
+    immutable are folded.
+
+    Returns
+    -------
+    func : callable or None
+        Function taking no argument and returning the value of the
+        expression or None if the expression cannot be folded.
+
+    """
+    if '{' in expr:
+        return None
+
+    try:
+        tree = ast.parse(expr.strip(), mode='eval')
+        if not _is_pure(tree):
+            return None
+        value = safe_eval(compile(tree, '<string>', 'eval'), {})
+    except Exception:
+        return None
+
+    if not _is_immutable(value):
+        return None
+
+    return lambda: value
@@ -9,12 +9,14 @@
 """Definition of the base classes for interfaces in tasks.
 
 """
+import logging
+
 from atom.api import (Atom, ForwardTyped, Typed, Str, Dict, Property,
                       Constant)
 
 from ...utils.traceback import format_exc
 from ...utils.atom_util import HasPrefAtom, tagged_members
-from .base_tasks import BaseTask
+from .base_tasks import BaseTask, _list_tagged_references
 from . import validators
 
 
@@ -65,6 +67,15 @@ class InterfaceableMixin(Atom):
         if self.interface:
             self.interface.prepare()
 
+    def _list_referenced_entries(self):
+        """Add the entries referenced by the interface.
+
+        """
+        entries = super(InterfaceableMixin, self)._list_referenced_entries()
+        if self.interface:
+            entries |= self.interface._list_referenced_entries()
+        return entries
+
     def perform(self, *args, **kwargs):
         """Implementation of perform relying on interfaces.
 
@@ -80,8 +91,13 @@ class InterfaceableMixin(Atom):
         INTERFACE SYSTEM.
 
         """
-        if self.interface:
-            return self.interface.perform(*args, **kwargs)
+        interface = self.interface
+        if interface:
+            tracer = interface.task.root.tracer
+            if tracer is not None:
+                with tracer.span(interface.interface_id, 'interface'):
+                    return interface.perform(*args, **kwargs)
+            return interface.perform(*args, **kwargs)
         else:
             return self.i_perform(*args, **kwargs)
 
@@ -331,10 +347,18 @@ class BaseInterface(HasPrefAtom):
         """Prepare the interface to be performed.
 
         This method is called once by the parent task before starting the
-        execution.
+        execution. By default, the constant expressions of the members tagged
+        with 'feval' are folded into the task evaluation cache.
 
         """
-        pass
+        task = self.task
+        folded = [n for n in tagged_members(self, 'feval')
+                  if task._fold_constant(getattr(self, n))]
+        if folded:
+            logger = logging.getLogger(__name__)
+            logger.debug('%s : folded constant members %s',
+                         task.get_error_path() + '-' + type(self).__name__,
+                         ', '.join(folded))
 
     def perform(self, *args, **kwargs):
         """Method called by the parent perform method.
@@ -362,6 +386,12 @@ class BaseInterface(HasPrefAtom):
         interface.update_members_from_preferences(config)
         return interface
 
+    def _list_referenced_entries(self):
+        """List the database entries whose value is used by the interface.
+
+        """
+        return _list_tagged_references(self)
+
 
 class TaskInterface(BaseInterface):
     """Base class to use when writing a task interface.
@@ -11,12 +11,12 @@
 """
 from collections import OrderedDict
 
-from atom.api import (Typed, set_default)
+from atom.api import (Typed, Bool, set_default)
 
 from ....utils.traceback import format_exc
 from ....utils.atom_util import (ordered_dict_from_pref, ordered_dict_to_pref)
 
-from ..base_tasks import SimpleTask
+from ..base_tasks import SimpleTask, _extract_references
 
 
 class FormulaTask(SimpleTask):
@@ -38,10 +38,31 @@ class FormulaTask(SimpleTask):
         """Evaluate alll formulas and update the database.
 
         """
+        if self._batch_writes:
+            self.write_values_in_database(
+                {k: self.format_and_eval_string(v)
+                 for k, v in self.formulas.items()})
+            return
+
         for k, v in self.formulas.items():
             value = self.format_and_eval_string(v)
             self.write_in_database(k, value)
 
+    def prepare(self):
+        """Fold the formulas which do not reference any database entry.
+
+        If no formula references the result of another one, all the results
+        are written at once.
+
+        """
+        super(FormulaTask, self).prepare()
+        references = set()
+        for v in self.formulas.values():
+            self._fold_constant(v)
+            references.update(_extract_references(v))
+        self._batch_writes = not any(self._task_entry(k) in references
+                                     for k in self.formulas)
+
     def check(self, *args, **kwargs):
         """Validate that all formulas can be evaluated.
 
@@ -60,6 +81,20 @@ class FormulaTask(SimpleTask):
                     "Failed to eval the formula {}: {}".format(k, format_exc())
         return test, traceback
 
+    # --- Private API ---------------------------------------------------------
+
+    #: Whether the results of the formulas can be written at once.
+    _batch_writes = Bool()
+
+    def _list_referenced_entries(self):
+        """Add the entries referenced in the formulas.
+
+        """
+        entries = super(FormulaTask, self)._list_referenced_entries()
+        for formula in self.formulas.values():
+            entries.update(_extract_references(formula))
+        return entries
+
     def _post_setattr_formulas(self, old, new):
         """Observer keeping the database entries in sync with the declared
         formulas.
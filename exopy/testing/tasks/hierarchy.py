@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright 2015-2018 by Exopy Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Generation of synthetic task hierarchies of arbitrary size.
+
+"""
+from collections import OrderedDict
+from itertools import count
+
+from exopy.tasks.tasks.base_tasks import BaseTask, RootTask, DEP_TYPE
+from exopy.tasks.tasks.task_interface import DEP_TYPE as INTERFACE_DEP_TYPE
+from exopy.tasks.tasks.logic.loop_task import LoopTask
+from exopy.tasks.tasks.logic.loop_iterable_interface import\
+    IterableLoopInterface
+from exopy.tasks.tasks.logic.conditional_task import ConditionalTask
+from exopy.tasks.tasks.util.formula_task import FormulaTask
+
+from .util import CheckTask
+
+
+#: Kinds of the children added to each complex task, the i-th child being of
+#: kind KINDS[i % len(KINDS)]. Loops and conditionals are replaced by simple
+#: tasks at the last level.
+KINDS = ('loop', 'formula', 'conditional', 'check')
+
+
+def build_hierarchy(depth, width, root=None):
+    """Build a synthetic hierarchy of tasks.
+
+    Each complex task (starting with the root) holds width children whose kind
+    cycles through KINDS:
+
+    - loops on range(2) using an IterableLoopInterface.
+    - formulas computing a value from the index of the enclosing loop and
+      exposing it to their parent through an access exception.
+    - conditionals whose condition references the index of the enclosing loop.
+    - CheckTask executed in parallel in one of two pools (the formulas wait on
+      all pools).
+
+    Parameters
+    ----------
+    depth : int
+        Number of levels of tasks below the root.
+
+    width : int
+        Number of children of each complex task.
+
+    root : RootTask, optional
+        Root to which to add the tasks. A new root is created if None.
+
+    Returns
+    -------
+    root : RootTask
+        Root of the hierarchy.
+
+    """
+    root = root if root is not None else RootTask()
+    _add_children(root, depth, width, count(), None)
+    return root
+
+
+def hierarchy_size(depth, width):
+    """Number of tasks (root excluded) created by build_hierarchy.
+
+    """
+    complex_children = sum(1 for i in range(width)
+                           if KINDS[i % len(KINDS)] in ('loop', 'conditional'))
+    size = 0
+    for _ in range(depth):
+        size = width + complex_children*size
+    return size
+
+
+def collect_build_dependencies(root):
+    """Collect the build dependencies of a hierarchy of tasks.
+
+    Returns
+    -------
+    dependencies : dict
+        Dependencies suitable for build_task_from_config.
+
+    """
+    dependencies = {DEP_TYPE: {}, INTERFACE_DEP_TYPE: {}}
+    for obj in root.traverse():
+        if isinstance(obj, BaseTask):
+            dependencies[DEP_TYPE][obj.task_id] = type(obj)
+        else:
+            dependencies[INTERFACE_DEP_TYPE][obj.interface_id] = type(obj)
+    return dependencies
+
+
+def _add_children(parent, depth, width, counter, loop):
+    """Add the children of a complex task and recursively their own.
+
+    """
+    for i in range(width):
+        kind = KINDS[i % len(KINDS)]
+        if depth <= 1 and kind in ('loop', 'conditional'):
+            kind = 'check'
+        name = '%s_%d' % (kind, next(counter))
+        index = '{%s_index}' % loop.name if loop is not None else '0'
+
+        if kind == 'loop':
+            task = LoopTask(name=name)
+            task.interface = IterableLoopInterface(iterable='range(2)')
+        elif kind == 'conditional':
+            task = ConditionalTask(name=name, condition=index + ' >= 0')
+        elif kind == 'formula':
+            task = FormulaTask(name=name,
+                               formulas=OrderedDict([('value',
+                                                      index + ' + 1.0')]))
+        else:
+            task = CheckTask(name=name,
+                             parallel={'activated': True,
+                                       'pool': 'pool_%d' % (i % 2)})
+
+        parent.add_child_task(i, task)
+        if kind == 'formula' and not isinstance(parent, RootTask):
+            task.add_access_exception('value', 1)
+
+        if kind in ('loop', 'conditional'):
+            _add_children(task, depth - 1, width, counter,
+                          task if kind == 'loop' else loop)
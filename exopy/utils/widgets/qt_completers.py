@@ -30,7 +30,8 @@ class QDelimitedCompleter(QtWidgets.QCompleter):
         of completion.
 
     entries : iterable
-        Iterable of values used to propose completion.
+        Iterable of values used to propose completion. The entries are kept
+        sorted so that Qt can look for completions using a binary search.
 
     entries_updaters : callable
         Callable used to refresh the list of entries called once for the first
@@ -63,7 +64,9 @@ class QDelimitedCompleter(QtWidgets.QCompleter):
             raise ValueError(msg.format(parent))
 
         self.setCaseSensitivity(QtCore.Qt.CaseSensitive)
-        self.setModel(QtCore.QStringListModel(entries, self))
+        self.setModelSorting(QtWidgets.QCompleter.CaseSensitivelySortedModel)
+        self._entries = None
+        self._update_entries(entries)
 
         self.activated[str].connect(self.complete_text)
         self.setWidget(parent)
@@ -80,8 +83,7 @@ class QDelimitedCompleter(QtWidgets.QCompleter):
             text = self.text_getter()
 
         if self._upddate_entries and self.entries_updater:
-            entries = self.entries_updater()
-            self.setModel(QtCore.QStringListModel(entries, self))
+            self._update_entries(self.entries_updater())
             self._upddate_entries = False
 
         all_text = str(text)
@@ -120,8 +122,13 @@ class QDelimitedCompleter(QtWidgets.QCompleter):
     def _update_entries(self, entries):
         """Update the completer completion model.
 
+        The model is not rebuilt if the entries did not change.
+
         """
-        self.setModel(QtCore.QStringListModel(entries))
+        entries = sorted(entries)
+        if entries != self._entries:
+            self._entries = entries
+            self.setModel(QtCore.QStringListModel(entries, self))
 
     def _text_edit_complete(self):
         """Propose completion for QTextEdit.
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright 2015-2018 by Exopy Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the throughput of the running mode database for several threads.
+
+Each thread repeatedly writes its own entries (one by one and through
+transactions) and reads a set of entries shared by all threads. The aggregate
+number of operations per second is reported for each number of threads.
+
+On interpreters with a global interpreter lock the aggregate throughput cannot
+grow with the number of threads, but it should not collapse either : the
+threads do not contend on a single database lock anymore.
+
+Usage : python scripts/benchmark_database.py [max_threads] [duration]
+
+"""
+import sys
+from threading import Thread, Barrier
+from time import perf_counter
+
+from exopy.tasks.tasks.database import TaskDatabase
+
+
+def build_database(n_threads):
+    """Build a running database with 4 entries per thread.
+
+    """
+    database = TaskDatabase()
+    for i in range(n_threads):
+        for j in range(4):
+            database.set_value('root', 'val_%d_%d' % (i, j), 0)
+    database.prepare_to_run()
+    return database
+
+
+def worker(database, thread_id, duration, barrier, counts):
+    """Perform database operations until the duration elapsed.
+
+    """
+    names = ['val_%d_%d' % (thread_id, j) for j in range(4)]
+    own = list(database.get_entries_indexes('root', names).values())
+    shared = list(range(min(8, len(database._flat_database))))
+
+    barrier.wait()
+    ops = 0
+    stop = perf_counter() + duration
+    while perf_counter() < stop:
+        for i in range(100):
+            database.set_value_by_index(own[0], i)
+            database.set_values_by_index([(own[1], i), (own[2], i)])
+            database.get_values_by_index(shared)
+            database.get_value_by_index(own[3])
+        ops += 400
+    counts[thread_id] = ops
+
+
+def run(n_threads, duration):
+    """Run the benchmark for a given number of threads.
+
+    Returns
+    -------
+    throughput : float
+        Aggregate number of operations per second.
+
+    """
+    database = build_database(n_threads)
+    barrier = Barrier(n_threads)
+    counts = [0]*n_threads
+    threads = [Thread(target=worker,
+                      args=(database, i, duration, barrier, counts))
+               for i in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(counts)/duration
+
+
+if __name__ == '__main__':
+    max_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    n = 1
+    reference = None
+    while n <= max_threads:
+        throughput = run(n, duration)
+        reference = reference or throughput
+        print('%2d threads : %10.0f ops/s (x%.2f)' %
+              (n, throughput, throughput/reference))
+        n *= 2
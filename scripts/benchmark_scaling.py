@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright 2015-2018 by Exopy Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure how the cost of the task framework operations scales with the size
+of the hierarchy.
+
+For each requested number of tasks, a synthetic hierarchy is generated (see
+exopy.testing.tasks.hierarchy) and the following quantities are measured:
+
+- the time to rebuild the hierarchy from its configuration (as done by the
+  process engine) and the memory used by the rebuilt hierarchy.
+- the time to run the checks.
+- the time to flatten the database for running (without and with a cached
+  layout).
+- the time to register all the tasks in a new database.
+- the time to list the entries accessible from the deepest task in edition
+  mode (first and subsequent calls).
+
+Comparing the time per task across sizes exhibits super-linear behaviours.
+
+Usage : python scripts/benchmark_scaling.py [size, ...]
+
+"""
+import sys
+import pickle
+import tracemalloc
+from tempfile import mkdtemp
+from time import perf_counter
+
+from exopy.tasks.api import RootTask
+from exopy.tasks.tasks import database
+from exopy.tasks.tasks.base_tasks import BaseTask
+from exopy.tasks.tasks.database import TaskDatabase
+from exopy.tasks.utils.building import build_task_from_config
+from exopy.testing.tasks.hierarchy import (build_hierarchy, hierarchy_size,
+                                           collect_build_dependencies)
+
+
+def choose_shape(size):
+    """Find the depth and width of the hierarchy closest to a given size.
+
+    """
+    shapes = [(d, w) for d in range(2, 7) for w in range(4, 41)]
+    return min(shapes, key=lambda s: (abs(hierarchy_size(*s) - size), s[0]))
+
+
+def timed(function, *args):
+    """Call a function and return its result and the time it took.
+
+    """
+    tic = perf_counter()
+    result = function(*args)
+    return result, perf_counter() - tic
+
+
+def measure(size):
+    """Measure the operations on a hierarchy of about size tasks.
+
+    Returns
+    -------
+    results : list
+        List of (name, value, unit) tuples.
+
+    """
+    depth, width = choose_shape(size)
+    root = build_hierarchy(depth, width, RootTask(default_path=mkdtemp()))
+    tasks = [t for t in root.traverse() if isinstance(t, BaseTask)]
+    deepest = max(tasks, key=lambda t: t.depth)
+    results = [('tasks', len(tasks) - 1, ''),
+               ('shape (depth, width)', (depth, width), '')]
+
+    root.update_preferences_from_members()
+    config = pickle.dumps(root.preferences)
+    dependencies = collect_build_dependencies(root)
+
+    # Listing the accessible entries in edition mode.
+    path = deepest.path
+    _, first = timed(root.database.list_accessible_entries, path)
+    tic = perf_counter()
+    for _ in range(100):
+        root.database.list_accessible_entries(path)
+    results.append(('list_accessible_entries (first)', first*1e3, 'ms'))
+    results.append(('list_accessible_entries',
+                    (perf_counter() - tic)*1e1, 'ms'))
+
+    # Rebuilding the hierarchy and the memory it uses.
+    built, duration = timed(build_task_from_config, pickle.loads(config),
+                            dependencies, True)
+    results.append(('build_from_config', duration*1e3, 'ms'))
+    tracemalloc.start()
+    other = build_task_from_config(pickle.loads(config), dependencies, True)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results.append(('memory', memory/2**20, 'MiB'))
+
+    _, duration = timed(built.check)
+    results.append(('check', duration*1e3, 'ms'))
+
+    # Both rebuilt hierarchies share the same database structure.
+    database._LAYOUT_CACHE.clear()
+    _, duration = timed(built.database.prepare_to_run)
+    results.append(('prepare_to_run', duration*1e3, 'ms'))
+    _, duration = timed(other.database.prepare_to_run)
+    results.append(('prepare_to_run (cached layout)', duration*1e3, 'ms'))
+
+    # Registering all the tasks of a rebuilt hierarchy in a new database.
+    fresh = build_task_from_config(pickle.loads(config), dependencies, True)
+    fresh.database = TaskDatabase()
+    for task in fresh.traverse():
+        if isinstance(task, BaseTask):
+            task.database = fresh.database
+    _, duration = timed(fresh.register_in_database)
+    results.append(('register_in_database', duration*1e3, 'ms'))
+
+    return results
+
+
+if __name__ == '__main__':
+    sizes = [int(s) for s in sys.argv[1:]] or [100, 1000, 10000]
+    for size in sizes:
+        print('Hierarchy of about %d tasks' % size)
+        for name, value, unit in measure(size):
+            if isinstance(value, float):
+                print('  %-35s %10.3f %s' % (name, value, unit))
+            else:
+                print('  %-35s %10s %s' % (name, value, unit))
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright 2015-2018 by Exopy Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Measure the overhead of the task framework.
+
+Each benchmark case measures the time taken by an elementary operation of the
+framework (database access, string formatting, loop iteration, measurement
+sent to the process engine subprocess) using tasks doing nothing, so that
+only the time spent in the framework itself is measured. The best time over
+several repetitions is reported, per operation.
+
+The results can be saved to a JSON file and later compared to a new run, for
+example to check that upgrading exopy or one of its dependencies does not
+make the measurements slower. When comparing, the script exits with a non
+zero status if a case got slower than the allowed tolerance.
+
+Usage : python scripts/benchmark_tasks.py [-h] [-k PATTERN] [--repeat N]
+                                          [--save FILE] [--compare FILE]
+                                          [--tolerance FRACTION]
+
+"""
+import sys
+import json
+import argparse
+from collections import OrderedDict
+from multiprocessing import Event, Pipe, Queue
+from tempfile import mkdtemp
+from threading import Thread
+from time import perf_counter
+
+from exopy.tasks.api import RootTask
+from exopy.tasks.tasks.database import TaskDatabase
+from exopy.tasks.tasks.logic.loop_task import LoopTask
+from exopy.tasks.tasks.logic.loop_iterable_interface import\
+    IterableLoopInterface
+from exopy.testing.tasks.util import CheckTask
+from exopy.testing.tasks.hierarchy import collect_build_dependencies
+from exopy.measurement.engines.process_engine.subprocess import TaskProcess
+
+
+#: Benchmark cases by name. Each case is a function taking no argument and
+#: returning a callable to time and the number of operations it performs.
+CASES = OrderedDict()
+
+
+def case(name):
+    """Register a benchmark case under the given name.
+
+    """
+    def register(function):
+        CASES[name] = function
+        return function
+    return register
+
+
+def build_root():
+    """Build a root task ready to be performed.
+
+    """
+    root = RootTask(should_stop=Event(), should_pause=Event(),
+                    paused=Event(), resumed=Event())
+    root.default_path = mkdtemp()
+    return root
+
+
+def build_loop(name, points, children, **kwargs):
+    """Build a loop iterating on range(points) with CheckTask children.
+
+    """
+    loop = LoopTask(name=name, **kwargs)
+    loop.interface = IterableLoopInterface(iterable='range(%d)' % points)
+    for i in range(children):
+        loop.add_child_task(i, CheckTask(name='%s_c%d' % (name, i)))
+    return loop
+
+
+def running_database(entries=100):
+    """Build a database in running mode with entries in a nested node.
+
+    """
+    database = TaskDatabase()
+    database.create_node('root', 'node')
+    for i in range(entries):
+        database.set_value('root/node', 'val_%d' % i, i)
+    database.prepare_to_run()
+    return database
+
+
+@case('database.set_value')
+def database_set_value():
+    """Set an entry in running mode.
+
+    """
+    database = running_database()
+    n = 100000
+
+    def run():
+        set_value = database.set_value
+        for i in range(n):
+            set_value('root/node', 'val_1', i)
+    return run, n
+
+
+@case('database.get_value')
+def database_get_value():
+    """Get an entry from a child node in running mode.
+
+    """
+    database = running_database()
+    n = 100000
+
+    def run():
+        get_value = database.get_value
+        for i in range(n):
+            get_value('root/node', 'val_1')
+    return run, n
+
+
+@case('task.format_string')
+def task_format_string():
+    """Format a string referencing two entries.
+
+    """
+    root = build_root()
+    task = CheckTask(name='check')
+    root.add_child_task(0, task)
+    root.write_in_database('a', 1)
+    root.write_in_database('b', 'test')
+    root.prepare()
+    n = 20000
+
+    def run():
+        for i in range(n):
+            task.format_string('{a} and {b}')
+    return run, n
+
+
+@case('task.format_and_eval_string')
+def task_format_and_eval_string():
+    """Format and evaluate a string referencing two entries.
+
+    """
+    root = build_root()
+    task = CheckTask(name='check')
+    root.add_child_task(0, task)
+    root.write_in_database('a', 1)
+    root.write_in_database('b', 2.0)
+    root.prepare()
+    n = 20000
+
+    def run():
+        for i in range(n):
+            task.format_and_eval_string('{a} + 2*{b}')
+    return run, n
+
+
+@case('loop.noop_children')
+def loop_noop_children():
+    """Iterate a loop with 10 children doing nothing.
+
+    """
+    points = 10000
+    root = build_root()
+    root.add_child_task(0, build_loop('loop', points, 10))
+    return root.perform, points
+
+
+@case('loop.nested')
+def loop_nested():
+    """Iterate two nested loops, the inner one having 5 children.
+
+    """
+    outer, inner = 100, 100
+    root = build_root()
+    loop = build_loop('outer', outer, 0)
+    loop.add_child_task(0, build_loop('inner', inner, 5))
+    root.add_child_task(0, loop)
+    return root.perform, outer*inner
+
+
+@case('loop.parallel_wait')
+def loop_parallel_wait():
+    """Iterate a loop with 4 parallel children and a task waiting on them.
+
+    """
+    points = 1000
+    root = build_root()
+    loop = build_loop('loop', points, 0)
+    for i in range(4):
+        loop.add_child_task(i, CheckTask(name='par%d' % i,
+                                         parallel={'activated': True,
+                                                   'pool': 'bench'}))
+    loop.add_child_task(4, CheckTask(name='wait', wait={'activated': True}))
+    root.add_child_task(0, loop)
+    return root.perform, points
+
+
+class RoundTrip(object):
+    """Send measurements to a TaskProcess and wait for their results.
+
+    """
+    def __init__(self, points):
+        root = build_root()
+        root.add_child_task(0, build_loop('loop', points, 1))
+        root.update_preferences_from_members()
+        self.dependencies = collect_build_dependencies(root)
+        self.config = root.preferences
+        self.database = root.database.copy_node_values()
+
+        self.pipe, process_pipe = Pipe()
+        self.log_queue = Queue()
+        self.monitor_queue = Queue()
+        self.process_stop = Event()
+        self.process = TaskProcess(process_pipe, self.log_queue,
+                                   self.monitor_queue, Event(), Event(),
+                                   Event(), Event(), Event(),
+                                   self.process_stop)
+        self.process.daemon = True
+        self.process.start()
+        self.log_thread = Thread(target=self._drain_logs, daemon=True)
+        self.log_thread.start()
+
+    def __call__(self):
+        """Perform one measurement in the subprocess.
+
+        """
+        self.pipe.send(('bench', self.config, self.dependencies, {},
+                        [], self.database, False))
+        self.pipe.recv()
+        result, errors, _ = self.pipe.recv()
+        if not result:
+            raise RuntimeError('Measurement failed : %s' % errors)
+
+    def close(self):
+        """Stop the subprocess.
+
+        """
+        self.process_stop.set()
+        self.process.join()
+        self.log_thread.join()
+
+    def _drain_logs(self):
+        """Consume the log records sent by the subprocess.
+
+        """
+        while self.log_queue.get() is not None:
+            pass
+
+
+@case('engine.round_trip')
+def engine_round_trip():
+    """Perform a 100 points measurement in the engine subprocess.
+
+    """
+    runs = 10
+    round_trip = RoundTrip(100)
+    round_trip()  # Warm up the subprocess.
+
+    def run():
+        for i in range(runs):
+            round_trip()
+    run.close = round_trip.close
+    return run, runs
+
+
+def measure(name, repeat):
+    """Measure the best time per operation of a case.
+
+    """
+    run, ops = CASES[name]()
+    try:
+        best = float('inf')
+        for _ in range(repeat):
+            tic = perf_counter()
+            run()
+            best = min(best, perf_counter() - tic)
+    finally:
+        if hasattr(run, 'close'):
+            run.close()
+    return best/ops
+
+
+def main(argv):
+    """Run the benchmark cases and compare them to a baseline.
+
+    """
+    parser = argparse.ArgumentParser(description='Measure the overhead of '
+                                     'the task framework.')
+    parser.add_argument('-k', dest='pattern', default='',
+                        help='Only run the cases whose name contains PATTERN')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of repetitions of each case')
+    parser.add_argument('--save', help='Save the results to a JSON file')
+    parser.add_argument('--compare',
+                        help='Compare to the results saved in a JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Allowed relative slow down when comparing')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = OrderedDict()
+    slower = []
+    for name in CASES:
+        if args.pattern not in name:
+            continue
+        results[name] = measure(name, args.repeat)
+        line = '%-30s %12.3f us/op' % (name, results[name]*1e6)
+        if name in baseline:
+            ratio = results[name]/baseline[name]
+            line += '   (x%.2f)' % ratio
+            if ratio > 1 + args.tolerance:
+                slower.append(name)
+                line += ' SLOWER'
+        print(line)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if slower:
+        print('Slower than the baseline : %s' % ', '.join(slower))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -16,7 +16,7 @@ from time import sleep
 
 import enaml
 import pytest
-from atom.api import Bool, Str, Value
+from atom.api import Bool, Str, Value, set_default
 
 from exopy.measurement.engines.api import ExecutionInfos
 from exopy.measurement.engines.process_engine.subprocess import TaskProcess
@@ -54,6 +54,19 @@ class WaitingTask(SimpleTask):
             s.recv(4096)
 
 
+class WritingTask(SimpleTask):
+    """Simple Task writing the evaluation of a formula in the database.
+
+    """
+    formula = Str('1').tag(pref=True)
+
+    database_entries = set_default({'value': 1})
+
+    def perform(self):
+        self.write_in_database('value',
+                               self.format_and_eval_string(self.formula))
+
+
 class ExecThread(Thread):
     """Thread storing the return value of the engine perform method.
 
@@ -165,6 +178,30 @@ def exec_infos(measurement_workbench, measurement, tmpdir, process_engine,
             )
 
 
+@pytest.fixture
+def writing_infos(measurement_workbench, measurement, tmpdir, process_engine):
+
+    tp = measurement_workbench.get_plugin('exopy.tasks')
+    tp._tasks.contributions['measurement.WritingTask'] =\
+        TaskInfos(cls=WritingTask)
+
+    r = RootTask(default_path=str(tmpdir))
+    r.add_child_task(0, WritingTask(name='test'))
+
+    measurement.root_task = r
+    deps = measurement.dependencies
+    res, msg, errors = deps.collect_runtimes()
+    assert res
+
+    return ExecutionInfos(
+            id='test',
+            task=r,
+            build_deps=deps.get_build_dependencies().dependencies,
+            runtime_deps=deps.get_runtime_dependencies('main'),
+            checks=not measurement.forced_enqueued,
+            )
+
+
 def test_proc_filter():
     """Test the filter for the logging.
 
@@ -238,6 +275,50 @@ def test_perform(process_engine, exec_infos, sync_server):
         sleep(0.01)
 
 
+@pytest.mark.timeout(30)
+def test_perform_unpicklable_results(process_engine, writing_infos):
+    """Test that the values which cannot be sent back are dropped.
+
+    """
+    writing_infos.task.children[0].formula = 'lambda: 1'
+    t = ExecThread(process_engine, writing_infos)
+    t.start()
+    t.join()
+    assert t.value.success
+    database = t.value.results['database']
+    assert 'root/test_value' not in database
+    assert 'root/default_path' in database
+
+    process_engine.shutdown()
+    while not process_engine.status == 'Stopped':
+        sleep(0.01)
+
+
+@pytest.mark.timeout(30)
+def test_perform_reusing_tasks(process_engine, writing_infos, caplog):
+    """Test performing twice the same measurement with cached tasks.
+
+    """
+    process_engine.tree_cache_size = 1
+    root = writing_infos.task
+    root.children[0].formula = '{factor}*2'
+    for factor in (2, 3):
+        root.write_in_database('factor', factor)
+        t = ExecThread(process_engine, writing_infos)
+        t.start()
+        t.join()
+        assert t.value.success
+        database = t.value.results['database']
+        assert database['root/factor'] == factor
+        assert database['root/test_value'] == 2*factor
+
+    assert 'Task reused' in caplog.text
+
+    process_engine.shutdown()
+    while not process_engine.status == 'Stopped':
+        sleep(0.01)
+
+
 @pytest.mark.timeout(30)
 def test_handle_fail_check(process_engine, exec_infos):
     """Test handling a measurement failing the checks.
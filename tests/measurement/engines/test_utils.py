@@ -10,13 +10,16 @@
 
 """
 from multiprocessing import Queue
-from pickle import dumps
+from pickle import dumps, loads
 
+import numpy as np
 import pytest
 
 from exopy.tasks.tasks.database import TaskDatabase
 from exopy.measurement.engines.api import BaseEngine
-from exopy.measurement.engines.utils import MeasureSpy, ThreadMeasureMonitor
+from exopy.measurement.engines.utils import (MeasureSpy, ThreadMeasureMonitor,
+                                             SharedArrayRing, SharedArrayRef,
+                                             make_results_picklable)
 
 
 def test_spy(caplog):
@@ -28,10 +31,12 @@ def test_spy(caplog):
     data = TaskDatabase()
     data.set_value('root', 'test', 0)
     data.set_value('root', 'test2', 2)
+    data.set_value('root', 'test3', 3)
     data.prepare_to_run()
 
     spy = MeasureSpy(queue=q, observed_database=data,
-                     observed_entries=('root/test',))
+                     observed_entries=('root/test', 'root/test3'),
+                     flush_rate=1e-3)
 
     class A(object):
 
@@ -41,17 +46,186 @@ def test_spy(caplog):
     with pytest.raises(Exception):
         dumps(A())
 
+    # Only the latest value of each entry is sent.
     data.set_value('root', 'test', 1)
-    assert q.get(2) == ('root/test', 1)
+    data.set_value('root', 'test', 2)
+    data.set_value('root', 'test2', 1)
+    spy.flush()
+    assert loads(q.get(2)) == [('root/test', 2)]
 
+    # Unpicklable values are dropped.
     data.set_value('root', 'test', A())
+    data.set_value('root', 'test3', 1)
+    spy.flush()
     assert caplog.records
+    assert loads(q.get(2)) == [('root/test3', 1)]
 
     data.set_value('root', 'test2', 1)
+    spy.flush()
     assert q.empty()
 
+    # Updates done in a transaction are received at once.
+    with data.transaction() as transaction:
+        transaction.set_value('root', 'test', 4)
+        transaction.set_value('root', 'test3', 4)
+    spy.flush()
+    assert sorted(loads(q.get(2))) == [('root/test', 4), ('root/test3', 4)]
+    assert data.observed_entries == {'root/test', 'root/test3'}
+
+    data.set_value('root', 'test', 3)
     spy.close()
+    assert loads(q.get(2)) == [('root/test', 3)]
     assert q.get(2) == ('', '')
+    assert data.observed_entries is None
+
+
+@pytest.mark.timeout(10)
+def test_spy_periodic_flush():
+    """Test that the spy sends the pending updates periodically.
+
+    """
+    q = Queue()
+    data = TaskDatabase()
+    data.set_value('root', 'test', 0)
+    data.prepare_to_run()
+
+    spy = MeasureSpy(queue=q, observed_database=data,
+                     observed_entries=('root/test',), flush_rate=100)
+    for i in range(1000):
+        data.set_value('root', 'test', i)
+
+    batch = loads(q.get(2))
+    assert batch[-1][0] == 'root/test'
+    spy.close()
+    news = [batch]
+    while True:
+        n = q.get(2)
+        if n == ('', ''):
+            break
+        news.append(loads(n))
+    assert news[-1] == [('root/test', 999)]
+    assert len(news) < 1000
+
+
+@pytest.fixture
+def ring():
+    """Shared memory ring destroyed at the end of the test.
+
+    """
+    r = SharedArrayRing(1024)
+    yield r
+    r.close(unlink=True)
+
+
+def test_shared_array_ring(ring):
+    """Test storing arrays in a shared memory ring.
+
+    """
+    a = np.arange(100, dtype=float)
+    ref = ring.put(a)
+    assert ref == SharedArrayRef(0, 832, (100,), a.dtype.str)
+    np.testing.assert_array_equal(ring.get(ref), a)
+
+    assert SharedArrayRing.is_view(ring.get(ref))
+    assert SharedArrayRing.is_view(ring.get(ref)[1:])
+    assert not SharedArrayRing.is_view(a)
+    assert not SharedArrayRing.is_view(loads(dumps(a)))
+    assert not SharedArrayRing.is_view(1)
+
+    # Not enough space left without releasing the first array.
+    assert ring.put(np.ones(50)) is None
+
+    ring.release(ref)
+    ref = ring.put(np.ones((5, 10)))
+    assert ref.start == 1024
+    np.testing.assert_array_equal(ring.get(ref), np.ones((5, 10)))
+
+    # Too large arrays are never stored.
+    ring.release(ref)
+    assert ring.put(np.ones(200)) is None
+
+    # Attaching to the same block give access to the same data.
+    other = SharedArrayRing(ring.size, ring.shm.name, ring.released)
+    try:
+        np.testing.assert_array_equal(other.get(ref), np.ones((5, 10)))
+    finally:
+        other.close()
+
+
+def test_spy_with_ring(ring):
+    """Test sending large arrays through the shared memory ring.
+
+    """
+    q = Queue()
+    data = TaskDatabase()
+    data.set_value('root', 'small', 0)
+    data.set_value('root', 'large', 0)
+    data.prepare_to_run()
+
+    spy = MeasureSpy(queue=q, observed_database=data,
+                     observed_entries=('root/small', 'root/large'),
+                     flush_rate=1e-3, ring=ring)
+    spy.ring_threshold = 64
+    data.set_value('root', 'small', np.ones(2))
+    data.set_value('root', 'large', np.arange(16.))
+    spy.flush()
+    batch = dict(loads(q.get(2)))
+    np.testing.assert_array_equal(batch['root/small'], np.ones(2))
+    assert isinstance(batch['root/large'], SharedArrayRef)
+    spy.close()
+    assert q.get(2) == ('', '')
+
+
+def test_monitor_thread_with_ring(ring):
+    """Test resolving the arrays stored in the ring.
+
+    """
+    from atom.api import Value
+
+    class E(BaseEngine):
+
+        test = Value()
+
+        def _observe_progress(self, val):
+            self.test = {k: np.array(v) for k, v in val}
+
+    q = Queue()
+    e = E()
+    m = ThreadMeasureMonitor(e, q, ring)
+    m.start()
+
+    ref = ring.put(np.arange(16.))
+    q.put(dumps([('root/large', ref), ('root/small', 1)]))
+    q.put((None, None))
+    m.join()
+
+    np.testing.assert_array_equal(e.test['root/large'], np.arange(16.))
+    assert e.test['root/small'] == 1
+    assert ring.released.value == ref.end
+
+
+def test_make_results_picklable():
+    """Test converting the database snapshot into a picklable dict.
+
+    """
+    class A(object):
+
+        def __getstate__(self):
+            raise Exception()
+
+    data = TaskDatabase()
+    data.set_value('root', 'test', 1)
+    data.set_value('root', 'test2', A())
+    data.prepare_to_run()
+
+    results = {'database': data.snapshot(), 'timings': {}}
+    converted = make_results_picklable(results)
+    assert set(converted['database']) == {'root/test', 'root/test2'}
+    assert results['database'] is not converted['database']
+
+    converted = make_results_picklable(results, check=True)
+    assert converted == {'database': {'root/test': 1}, 'timings': {}}
+    dumps(converted)
 
 
 class B(object):
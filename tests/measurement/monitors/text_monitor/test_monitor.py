@@ -10,11 +10,15 @@
 
 """
 from operator import attrgetter
+from types import SimpleNamespace
 
 import pytest
 import enaml
+import numpy as np
 
 from exopy.tasks.tasks.database import TaskDatabase
+from exopy.measurement.engines.utils import (SharedArrayRing,
+                                             ThreadMeasureMonitor)
 from exopy.measurement.monitors.text_monitor.entry import MonitoredEntry
 from exopy.measurement.monitors.text_monitor.rules.std_rules\
      import FormatRule,  RejectRule
@@ -372,12 +376,48 @@ def test_process_news(exopy_qtbot, monitor, database):
         assert monitor.displayed_entries[2].value == '2/10'
     exopy_qtbot.wait_until(assert_displayed_entries)
 
+    monitor.process_news([('root/test_loop', 20), ('root/test_index', 3)])
+
+    def assert_batch_displayed_entries():
+        assert monitor.displayed_entries[0].value == '20'
+        assert monitor.displayed_entries[1].value == '3'
+        assert monitor.displayed_entries[2].value == '3/20'
+    exopy_qtbot.wait_until(assert_batch_displayed_entries)
+
     monitor.updaters = {}
     monitor.process_news(('root/test_index', 2))
     exopy_qtbot.wait(10)
     # Should simply pass silently
 
 
+def test_process_news_from_ring(monitor, database):
+    """Test that the arrays received through the shared memory are copied.
+
+    """
+    database.observe('notifier', monitor.handle_database_entries_change)
+    database.set_value('root', 'test_a', 0)
+    database.set_value('root', 'test_b', 0)
+
+    ring = SharedArrayRing(1024)
+    try:
+        engine = SimpleNamespace(progress=monitor.process_news)
+        thread = ThreadMeasureMonitor(engine, None, ring)
+        # Both arrays fill the ring and are hence stored at the same place.
+        thread._process_batch([('root/test_a', ring.put(np.ones(128)))])
+        thread._process_batch([('root/test_b', ring.put(np.zeros(128)))])
+
+        values = monitor._database_values
+        np.testing.assert_array_equal(values['root/test_a'], np.ones(128))
+        np.testing.assert_array_equal(values['root/test_b'], np.zeros(128))
+
+        # The arrays which are not in the ring are not copied.
+        private = np.ones(2)
+        thread._process_batch([('root/test_a', private)])
+        assert values['root/test_a'] is private
+    finally:
+        ring.close(unlink=True)
+
+
 def test_clear_state(monitor, database):
     """Test clearing the monitor state.
 
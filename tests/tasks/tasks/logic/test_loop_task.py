@@ -11,6 +11,7 @@
 """
 import gc
 import re
+from collections import OrderedDict
 from multiprocessing import Event
 
 import pytest
@@ -21,6 +22,7 @@ from exopy.testing.tasks.util import CheckTask
 from exopy.testing.util import show_and_close_widget, show_widget
 from exopy.tasks.api import RootTask
 from exopy.tasks.tasks.logic.loop_task import LoopTask
+from exopy.tasks.tasks.util.formula_task import FormulaTask
 from exopy.tasks.tasks.logic.loop_iterable_interface\
     import IterableLoopInterface
 from exopy.tasks.tasks.logic.loop_linspace_interface\
@@ -293,6 +295,45 @@ def test_linspace_handling_of_non_matching_stop(monkeypatch,
     np.testing.assert_array_equal(lt.database_entries['iterable'], expected)
 
 
+def test_linspace_caching(monkeypatch, linspace_interface):
+    """Test that the array is rebuilt only if the parameters change.
+
+    """
+    monkeypatch.setattr(LoopTask, 'perform_loop', false_perform_loop)
+    root = RootTask()
+    lt = LoopTask(name='Test')
+    root.add_child_task(0, lt)
+
+    lt.interface = linspace_interface
+    linspace_interface.perform()
+    array = lt.database_entries['iterable']
+    assert not array.flags.writeable
+    linspace_interface.perform()
+    assert lt.database_entries['iterable'] is array
+
+    linspace_interface.stop = '3.0'
+    linspace_interface.perform()
+    assert lt.database_entries['iterable'] is not array
+    assert lt.database_entries['iterable'][-1] == 3.0
+
+
+def test_geomspace_caching(geomspace_interface):
+    """Test that the array is rebuilt only if the parameters change.
+
+    """
+    root = RootTask()
+    lt = LoopTask(name='Test')
+    root.add_child_task(0, lt)
+
+    lt.interface = geomspace_interface
+    array = geomspace_interface.generate_geomspace_array()
+    assert not array.flags.writeable
+    assert geomspace_interface.generate_geomspace_array() is array
+
+    geomspace_interface.num = '3'
+    assert len(geomspace_interface.generate_geomspace_array()) == 3
+
+
 class TestLoopTask(object):
     """Test Loop task with and without included child.
 
@@ -572,12 +613,68 @@ class TestLoopTask(object):
         self.task.perform()
         assert self.root.get_from_database('Test_value') == 10
 
+    def test_perform_history(self, iterable_interface):
+        """Test recording the history of entries in a loop.
+
+        """
+        self.task.interface = iterable_interface
+        self.task.history_entries = ['value']
+        formula = FormulaTask(name='f', history_entries=['sq', 'unknown'])
+        formula.formulas = OrderedDict([('sq', '{Test_value}**2')])
+        self.task.add_child_task(0, formula)
+        inner = LoopTask(name='inner', history_entries=['value'])
+        inner.interface = IterableLoopInterface(iterable='range(3)')
+        self.task.add_child_task(1, inner)
+        self.root.prepare()
+        assert sorted(self.task._history_paths) == ['root/Test/f_sq',
+                                                    'root/Test_value']
+        assert inner._history_paths == ['root/Test/inner_value']
+
+        self.task.perform()
+        database = self.root.database
+        np.testing.assert_array_equal(database.get_history('root/Test_value'),
+                                      np.arange(11))
+        np.testing.assert_array_equal(database.get_history('root/Test/f_sq'),
+                                      np.arange(11)**2)
+        # The history of the inner loop is reset at each run.
+        np.testing.assert_array_equal(
+            database.get_history('root/Test/inner_value'), np.arange(3))
+        assert database.get_history('root/Test_index') is None
+
+    def test_perform_values_writing(self, monkeypatch, iterable_interface):
+        """Test that the index and value are written in a single update only
+        when one of them is observed.
+
+        """
+        self.task.interface = iterable_interface
+        iterable_interface.iterable = 'range(3)'
+        database = self.root.database
+        database.observed_entries = {'root/Test_index', 'root/Test_value'}
+        notifications = []
+        database.observe('notifier', lambda c: notifications.append(c))
+        self.root.prepare()
+
+        self.task.perform()
+        batches = [n for n in notifications if isinstance(n, list)]
+        assert batches[-1] == [('root/Test_index', 3), ('root/Test_value', 2)]
+
+        transactions = []
+        monkeypatch.setattr(type(database), 'set_values_by_index',
+                            lambda db, updates: transactions.append(updates))
+        database.observed_entries = set()
+        self.task.perform_loop([4, 5])
+        assert not transactions
+        assert self.root.get_from_database('Test_index') == 2
+        assert self.root.get_from_database('Test_value') == 5
+
     def test_perform2(self, linspace_interface):
         """Test performing a simple loop no timing. Linspace interface.
 
         """
         self.task.interface = linspace_interface
         self.root.prepare()
+        # Constant bounds are evaluated once when preparing.
+        assert '2.0' in self.task._eval_cache
 
         self.task.perform()
         assert self.root.get_from_database('Test_value') == 2.0
@@ -609,6 +706,25 @@ class TestLoopTask(object):
         self.task.perform()
         assert not self.task.children[1].perform_called
 
+    def test_perform_loop_values_update(self, linspace_interface):
+        """Test that the loop values are not rewritten if the iterable did
+        not change.
+
+        """
+        self.task.interface = linspace_interface
+        self.root.prepare()
+
+        self.task.perform()
+        values = self.root.get_from_database('Test_loop_values')
+        assert len(values) == 11 and values[-1] == 2.0
+        self.task.perform()
+        assert self.root.get_from_database('Test_loop_values') is values
+
+        self.task.perform_loop([1, 2])
+        assert self.root.get_from_database('Test_point_number') == 2
+        self.task.perform_loop([1, 2])
+        assert self.root.get_from_database('Test_loop_values') is not values
+
     def test_perform_task1(self, iterable_interface):
         """Test performing a loop with an embedded task no timing.
 
@@ -775,6 +891,45 @@ class TestLoopTask(object):
 
         assert self.task.children[0].perform_called == 1
 
+    @pytest.mark.parametrize('iterations, period, calls',
+                             [(3, 0.0, 3), (0, 10.0, 10), (3, 10.0, 3)])
+    def test_performing_stop_amortized(self, iterable_interface, iterations,
+                                       period, calls):
+        """Test checking for stop only every few iterations.
+
+        """
+        self.task.interface = iterable_interface
+        iterable_interface.iterable = 'range(10)'
+        self.task.stop_check_iterations = iterations
+        self.task.stop_check_period = period
+        stop = lambda t, v: t.root.should_stop.set()
+        self.task.add_child_task(0, CheckTask(name='Stop', custom=stop,
+                                              stoppable=False))
+        self.task.prepare()
+
+        self.task.perform()
+
+        assert self.task.children[0].perform_called == calls
+
+    @pytest.mark.parametrize('period, checks', [(0.0, 10), (10.0, 1)])
+    def test_stop_check_period_only(self, monkeypatch, iterable_interface,
+                                    period, checks):
+        """Test that setting only the period reduces the number of checks.
+
+        """
+        from exopy.tasks.tasks import decorators
+        calls = []
+        monkeypatch.setattr(decorators, 'handle_stop_pause',
+                            lambda root: calls.append(root))
+        self.task.interface = iterable_interface
+        iterable_interface.iterable = 'range(10)'
+        self.task.stop_check_period = period
+        self.task.prepare()
+
+        self.task.perform()
+
+        assert len(calls) == checks
+
     def test_performing_stop2(self, iterable_interface):
         """Test handling stop in the middle of an iteration.
 
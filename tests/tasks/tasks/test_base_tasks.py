@@ -101,6 +101,82 @@ def test_database_update_with_exception():
         task3.get_from_database('task2_val2')
 
 
+def test_execution_plan():
+    """Test that preparing a complex task builds the plan of its children
+    and that modifying the children discards it.
+
+    """
+    root = RootTask()
+    task1 = ComplexTask(name='task1')
+    task2 = SimpleTask(name='task2')
+    task1.add_child_task(0, task2)
+    root.add_child_task(0, task1)
+    root.prepare()
+
+    assert task1._execution_plan() == (task2.perform_,)
+    assert root._plan == (task1.perform_,)
+
+    task3 = SimpleTask(name='task3')
+    task1.add_child_task(1, task3)
+    assert task1._plan is None
+    assert len(task1._execution_plan()) == 2
+
+
+def test_reusing_tasks_after_restoring_database():
+    """Test that tasks can be prepared anew once the database went back to
+    edition mode.
+
+    """
+    root = RootTask()
+    task = SimpleTask(name='task', database_entries={'val': 1})
+    root.add_child_task(0, task)
+    values = root.database.copy_values()
+    root.prepare()
+    task.write_in_database('val', 2)
+    assert task.format_and_eval_string('{task_val} + 1') == 3
+
+    root.database.restore_values(values)
+    for t in root.traverse():
+        t.clear_database_caches()
+    task.write_in_database('val', 3)
+    assert root.database.get_value('root', 'task_val') == 3
+    assert task.format_and_eval_string('{task_val} + 1') == 4
+
+    root.prepare()
+    assert task.get_from_database('task_val') == 3
+
+
+def test_database_indexes_in_running_mode():
+    """Test that preparing a task resolves the indexes of the entries it
+    writes and reads.
+
+    """
+    root = RootTask()
+    task1 = ComplexTask(name='task1',
+                        database_entries={'val1': 2.0})
+    task2 = SimpleTask(name='task2',
+                       database_entries={'val2': 1},
+                       access_exs={'val2': 1})
+    task1.add_child_task(0, task2)
+    root.add_child_task(0, task1)
+
+    listener = SignalListener()
+    root.database.observe('notifier', listener.listen)
+    root.prepare()
+
+    index = root.database.get_entries_indexes('root', ['task2_val2'])
+    assert task2._entries_indexes == {'val2': index['task2_val2']}
+    task2.write_in_database('val2', 3)
+    assert listener.signals[-1] == ('root/task1/task2_val2', 3)
+    assert task1.get_from_database('task2_val2') == 3
+    assert 'task2_val2' in task1._read_indexes
+
+    # Entries which were not resolved at preparation are resolved lazily.
+    assert 'default_path' not in task2._read_indexes
+    assert task2.get_from_database('default_path') == ''
+    assert 'default_path' in task2._read_indexes
+
+
 def test_adding_child():
     """Test adding children.
 
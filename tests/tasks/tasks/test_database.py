@@ -9,6 +9,10 @@
 """Test for the database used fo tasks.
 
 """
+from threading import Thread, Event
+from time import sleep
+
+import numpy as np
 from pytest import raises
 
 from exopy.tasks.tasks.database import TaskDatabase
@@ -145,6 +149,58 @@ def test_access_exceptions():
     assert database.list_accessible_entries('root') == ['val1']
 
 
+def test_edition_caches_invalidation():
+    """Test that the cached nodes and accessible entries follow the edits.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.create_node('root/node1', 'node2')
+    database.set_value('root/node1/node2', 'val2', 'a')
+    assert database.list_accessible_entries('root/node1/node2') ==\
+        ['val1', 'val2']
+
+    database.set_value('root/node1', 'val3', 2)
+    assert database.list_accessible_entries('root/node1/node2') ==\
+        ['val1', 'val2', 'val3']
+
+    database.rename_values('root', ['val1'], ['val4'])
+    assert database.list_accessible_entries('root/node1/node2') ==\
+        ['val2', 'val3', 'val4']
+    assert database.get_value('root/node1/node2', 'val4') == 1
+
+    database.rename_node('root', 'node1', 'node3')
+    with raises(KeyError):
+        database.go_to_path('root/node1/node2')
+    assert database.get_value('root/node3/node2', 'val3') == 2
+
+    database.delete_node('root/node3', 'node2')
+    with raises(KeyError):
+        database.list_accessible_entries('root/node3/node2')
+
+    database.create_node('root/node3', 'node2')
+    assert database.list_accessible_entries('root/node3/node2') ==\
+        ['val3', 'val4']
+
+
+def test_list_accessible_entries_with_prefix():
+    """Test listing only the accessible entries starting with a prefix.
+
+    """
+    database = TaskDatabase()
+    for name in ('loop_index', 'loop_value', 'looping', 'form_value'):
+        database.set_value('root', name, 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'loop_elapsed', 2)
+
+    assert database.list_accessible_entries('root/node1', 'loop_') ==\
+        ['loop_elapsed', 'loop_index', 'loop_value']
+    assert database.list_accessible_entries('root', 'loop') ==\
+        ['loop_index', 'loop_value', 'looping']
+    assert database.list_accessible_entries('root', 'z') == []
+
+
 def test_access_exceptions_renaming_values():
     """Test renaming values linked to an access ex.
 
@@ -245,6 +301,91 @@ def test_flattening_database():
     database.prepare_to_run()
 
 
+def build_cached_database(value):
+    """Build a database with an access exception used to test layout caching.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', value)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.add_access_exception('root', 'root/node1', 'val2')
+    return database
+
+
+def test_layout_cache():
+    """Check that identical structures share their flat layout.
+
+    """
+    database = build_cached_database(1)
+    other = build_cached_database(2)
+    assert database.fingerprint() == other.fingerprint()
+
+    database.prepare_to_run()
+    other.prepare_to_run()
+    assert other._entry_index_map is database._entry_index_map
+    assert other.get_value('root', 'val1') == 2
+    assert other.get_value('root', 'val2') == 'a'
+    assert other.get_entries_indexes('root', ['val2']) ==\
+        database.get_entries_indexes('root/node1', ['val2'])
+
+
+def test_layout_cache_invalidation():
+    """Check that a structural edit changes the fingerprint.
+
+    """
+    database = build_cached_database(1)
+    fingerprint = database.fingerprint()
+    database.set_value('root', 'val1', 3)
+    assert database.fingerprint() == fingerprint
+
+    database.rename_node('root', 'node1', 'node2')
+    assert database.fingerprint() != fingerprint
+    database.prepare_to_run()
+    assert database.get_value('root/node2', 'val2') == 'a'
+    assert database.get_value('root', 'val2') == 'a'
+    assert 'root/node1/val2' not in database._entry_index_map
+
+
+def test_layout_cache_node_replaced_by_value():
+    """Check that replacing a node by a value changes the fingerprint.
+
+    """
+    database = TaskDatabase()
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val1', 1)
+    database.prepare_to_run()
+
+    other = TaskDatabase()
+    other.create_node('root', 'node1')
+    other.set_value('root/node1', 'val1', 1)
+    other.set_value('root', 'node1', 2)
+    assert other.fingerprint() != database.fingerprint()
+    assert other.list_accessible_entries('root') == ['node1']
+    other.prepare_to_run()
+    assert other.get_value('root', 'node1') == 2
+
+
+def test_restoring_values():
+    """Test going back to edition mode with the values copied before running.
+
+    """
+    database = build_cached_database([1])
+    values = database.copy_values()
+    database.prepare_to_run()
+    database.get_value('root', 'val1').append(3)
+    database.set_value('root', 'val2', 'b')
+
+    database.restore_values(values)
+    assert not database.running
+    assert database.get_value('root', 'val1') == [1]
+    assert database.get_value('root/node1', 'val2') == 'a'
+
+    database.create_node('root', 'node2')
+    database.prepare_to_run()
+    assert database.get_value('root', 'val1') == [1]
+
+
 def test_index_op_on_flat_database1():
     """Test operation on flat database relying on indexes.
 
@@ -355,3 +496,277 @@ def test_get_set_on_flat_database3():
 
     assert not database.set_value('root/node1', 'val2', 2)
     assert database.get_value('root/node1', 'val2') == 2
+
+
+def test_get_set_by_index_on_flat_database():
+    """Test get/set operations on flat database using indexes.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.add_access_exception('root', 'root/node1', 'val2')
+
+    notifications = []
+    database.observe('notifier', lambda c: notifications.append(c))
+    database.prepare_to_run()
+    index = database.get_entries_indexes('root', ['val2'])['val2']
+    assert not database.set_value_by_index(index, 'b')
+    assert database.get_value_by_index(index) == 'b'
+    assert database.get_value('root', 'val2') == 'b'
+    assert notifications == [('root/node1/val2', 'b')]
+
+
+def test_notifying_only_observed_entries():
+    """Test that only the observed entries are notified in running mode.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.observed_entries = {'root/node1/val2', 'root/unknown'}
+
+    notifications = []
+    database.observe('notifier', lambda c: notifications.append(c))
+    database.prepare_to_run()
+    database.set_value('root', 'val1', 2)
+    database.set_value('root/node1', 'val2', 'b')
+    assert database.get_value('root', 'val1') == 2
+    assert notifications == [('root/node1/val2', 'b')]
+
+    index = database.get_entries_indexes('root', ['val1'])['val1']
+    assert not database.is_tracked(index)
+    database.set_value_by_index(index, 3)
+    assert len(notifications) == 1
+
+    # Changing the observed entries while running is taken into account.
+    database.observed_entries = None
+    assert database.is_tracked(index)
+    database.set_value_by_index(index, 4)
+    assert notifications[-1] == ('root/val1', 4)
+
+
+def test_transaction():
+    """Test writing several entries at once.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.set_value('root', 'val3', 0)
+
+    # In edition mode values are written immediately.
+    with database.transaction() as transaction:
+        transaction.set_value('root', 'val4', 1)
+        assert database.get_value('root', 'val4') == 1
+
+    notifications = []
+    database.observe('notifier', lambda c: notifications.append(c))
+    database.observed_entries = {'root/val1', 'root/node1/val2'}
+    database.prepare_to_run()
+    indexes = database.get_entries_indexes('root', ['val1', 'val3'])
+
+    with database.transaction() as transaction:
+        transaction.set_value_by_index(indexes['val1'], 2)
+        transaction.set_value('root/node1', 'val2', 'b')
+        transaction.set_value_by_index(indexes['val3'], 3)
+        assert database.get_value('root', 'val1') == 1
+
+    assert database.get_value('root', 'val1') == 2
+    assert database.get_value('root/node1', 'val2') == 'b'
+    assert database.get_value('root', 'val3') == 3
+    assert notifications == [[('root/val1', 2), ('root/node1/val2', 'b')]]
+
+    # Nothing is written if an error occurs.
+    with raises(RuntimeError):
+        with database.transaction() as transaction:
+            transaction.set_value_by_index(indexes['val1'], 3)
+            raise RuntimeError()
+    assert database.get_value('root', 'val1') == 2
+
+    database.set_values_by_index([(indexes['val1'], 4)])
+    assert notifications[-1] == ('root/val1', 4)
+
+
+def test_concurrent_transactions_and_reads():
+    """Test that readers never see a partially applied transaction.
+
+    """
+    database = TaskDatabase()
+    for i in range(4):
+        database.set_value('root', 'val%d' % i, 0)
+    database.prepare_to_run()
+    indexes = list(database.get_entries_indexes(
+        'root', ['val%d' % i for i in range(4)]).values())
+
+    torn = []
+    stop = Event()
+
+    def write():
+        for i in range(2000):
+            database.set_values_by_index([(index, i) for index in indexes])
+        stop.set()
+
+    def read():
+        while not stop.is_set():
+            values = database.get_values_by_index(indexes)
+            if len(set(values)) != 1:
+                torn.append(values)
+
+    threads = [Thread(target=write), Thread(target=write),
+               Thread(target=read), Thread(target=read)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not torn
+    assert database._transactions_state[1] == 0
+
+
+def test_concurrent_notifications_order():
+    """Test that concurrent updates are notified and recorded in order.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 0)
+    database.prepare_to_run()
+    database.enable_history('root/val1', 1)
+    index = database.get_entries_indexes('root', ['val1'])['val1']
+
+    notifications = []
+    stale = []
+
+    def observer(news):
+        # Let the other threads run between the write and the notification.
+        sleep(0)
+        notifications.append(news)
+        if database.get_value_by_index(index) != news[1]:
+            stale.append(news)
+
+    database.observe('notifier', observer)
+
+    def write(offset):
+        for i in range(2000):
+            if i % 2:
+                database.set_value('root', 'val1', offset + i)
+            else:
+                database.set_values_by_index([(index, offset + i)])
+
+    threads = [Thread(target=write, args=(i*10000,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not stale
+    value = database.get_value('root', 'val1')
+    assert notifications[-1] == ('root/val1', value)
+    assert database.get_history('root/val1')[-1] == value
+
+
+def test_reading_during_transaction():
+    """Test falling back to locking when a transaction is in progress.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.set_value('root', 'val2', 2)
+    database.prepare_to_run()
+
+    database._begin_transaction()
+    assert database.get_values_by_index([0, 1]) == [1, 2]
+    database._end_transaction()
+
+
+def test_snapshot():
+    """Test taking a snapshot of the running database.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.add_access_exception('root', 'root/node1', 'val2')
+    database.prepare_to_run()
+
+    snapshot = database.snapshot()
+    database.set_value('root', 'val1', 2)
+    assert snapshot.get_value('root/val1') == 1
+    assert snapshot.get_value('root/val2') == 'a'
+    assert snapshot.to_dict() == {'root/val1': 1, 'root/node1/val2': 'a'}
+
+    # A transaction in progress forces to lock.
+    database._begin_transaction()
+    assert database.snapshot().get_value('root/val1') == 2
+    database._end_transaction()
+
+
+def test_entry_history():
+    """Test recording the last values of an entry.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 0)
+    database.set_value('root', 'val2', 0)
+    database.observed_entries = set()
+    database.prepare_to_run()
+    assert database.get_history('root/val1') is None
+
+    database.enable_history('root/val1', 3)
+    assert not len(database.get_history('root/val1'))
+    index = database.get_entries_indexes('root', ['val1'])['val1']
+    database.set_value('root', 'val1', 1)
+    database.set_value_by_index(index, 2)
+    history = database.get_history('root/val1')
+    np.testing.assert_array_equal(history, [1, 2])
+    with raises(ValueError):
+        history[0] = 1
+
+    with database.transaction() as transaction:
+        transaction.set_value('root', 'val1', 3)
+        transaction.set_value('root', 'val2', 3)
+    database.set_value('root', 'val1', 4)
+    np.testing.assert_array_equal(database.get_history('root/val1'),
+                                  [2, 3, 4])
+    assert database.get_history('root/val2') is None
+
+    # Changing the observed entries preserves the history.
+    notifications = []
+    database.observe('notifier', notifications.append)
+    database.observed_entries = None
+    database.set_value('root', 'val1', 5)
+    assert notifications == [('root/val1', 5)]
+    np.testing.assert_array_equal(database.get_history('root/val1'),
+                                  [3, 4, 5])
+
+    # Arrays are stored as rows.
+    database.enable_history('root/val1', 2)
+    database.set_value('root', 'val1', np.ones(4))
+    assert database.get_history('root/val1').shape == (1, 4)
+
+
+def test_entry_history_changing_types():
+    """Test that the history adapts to values of different types and shapes.
+
+    """
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 0)
+    database.prepare_to_run()
+
+    database.enable_history('root/val1', 4)
+    for value in (0, 0.5, 1.5):
+        database.set_value('root', 'val1', value)
+    np.testing.assert_array_equal(database.get_history('root/val1'),
+                                  [0, 0.5, 1.5])
+
+    database.set_value('root', 'val1', np.ones(2))
+    database.set_value('root', 'val1', 'a')
+    history = database.get_history('root/val1')
+    assert list(history[:2]) == [0.5, 1.5]
+    np.testing.assert_array_equal(history[2], np.ones(2))
+    assert history[3] == 'a'
+    assert database.get_value('root', 'val1') == 'a'
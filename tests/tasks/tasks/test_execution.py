@@ -11,7 +11,9 @@
 """
 import gc
 import os
+import json
 import threading
+from collections import OrderedDict
 from multiprocessing import Event
 from time import sleep
 
@@ -20,6 +22,11 @@ from atom.api import Str, set_default
 from enaml.application import deferred_call
 
 from exopy.tasks.tasks.base_tasks import RootTask, ComplexTask
+from exopy.tasks.tasks.logic.loop_task import LoopTask
+from exopy.tasks.tasks.logic.loop_iterable_interface import\
+    IterableLoopInterface
+from exopy.tasks.tasks.util.formula_task import FormulaTask
+from exopy.tasks.tasks.util.sleep_task import SleepTask
 from exopy.tasks.tasks.validators import Feval, SkipEmpty
 
 from exopy.testing.tasks.util import CheckTask, ExceptionTask
@@ -200,6 +207,103 @@ class TestTaskExecution(object):
                             meas_name + '_' + meas_id + '.prof')
         assert os.path.isfile(path)
 
+    @pytest.mark.timeout(10)
+    def test_root_perform_sampling_profile(self, tmpdir):
+        """Test running a task using the sampling profiler.
+
+        """
+        self.root.default_path = str(tmpdir)
+        root = self.root
+        aux = SleepTask(name='sleep', time='0.1',
+                        parallel={'activated': True, 'pool': 'test'})
+        root.add_child_task(0, aux)
+        root.should_profile = True
+        root.profile_mode = 'sampling'
+        root.sampling_rate = 500
+        root.perform()
+
+        path = os.path.join(self.root.default_path, 'M_001.folded')
+        assert not os.path.isfile(os.path.join(self.root.default_path,
+                                               'M_001.prof'))
+        with open(path) as f:
+            content = f.read()
+        # The task executed in a pool thread is visible.
+        assert 'perform (sleep_task.py' in content
+
+    @pytest.mark.timeout(10)
+    def test_root_perform_snapshot(self):
+        """Test that the snapshot includes the values written in pools.
+
+        """
+        def write(task, value):
+            sleep(0.1)
+            task.write_in_database('val', 2)
+
+        root = self.root
+        aux = CheckTask(name='test', custom=write,
+                        database_entries={'val': 1},
+                        parallel={'activated': True, 'pool': 'test'})
+        root.add_child_task(0, aux)
+        root.perform()
+
+        assert root.results['database'].get_value('root/test_val') == 2
+
+    @pytest.mark.timeout(10)
+    def test_root_perform_timing(self, tmpdir):
+        """Test recording the execution time of the tasks.
+
+        """
+        self.root.default_path = str(tmpdir)
+        root = self.root
+        comp = ComplexTask(name='comp')
+        aux = CheckTask(name='test',
+                        parallel={'activated': True, 'pool': 'test'})
+        comp.add_child_task(0, aux)
+        root.add_child_task(0, comp)
+        root.should_time_tasks = True
+        root.perform()
+
+        assert aux.perform_called == 1
+        assert root.results['database'].get_value('root/meas_id') == '001'
+        timings = root.results['timings']
+        assert set(timings) == {'root/comp', 'root/comp/test'}
+        assert timings['root/comp/test']['count'] == 1
+        assert (timings['root/comp']['max'] >=
+                timings['root/comp']['p50'] >= timings['root/comp']['min'])
+
+        path = os.path.join(self.root.default_path, 'M_001.timings.csv')
+        with open(path) as f:
+            assert f.readline().startswith('task,count,total')
+            assert len(f.readlines()) == 2
+
+    @pytest.mark.timeout(10)
+    def test_root_perform_tracing(self, tmpdir):
+        """Test recording a trace of the execution.
+
+        """
+        self.root.default_path = str(tmpdir)
+        root = self.root
+        par = CheckTask(name='test',
+                        parallel={'activated': True, 'pool': 'test'})
+        wait = CheckTask(name='wait', wait={'activated': True})
+        root.add_child_task(0, par)
+        root.add_child_task(1, wait)
+        root.should_trace = True
+        root.perform()
+
+        assert wait.perform_called == 1
+        path = os.path.join(self.root.default_path, 'M_001.trace.json')
+        with open(path) as f:
+            events = json.load(f)['traceEvents']
+
+        spans = {(e['name'], e['cat']) for e in events}
+        assert {('root', 'perform'), ('root/test', 'perform'),
+                ('test', 'pool'), ('root/wait', 'wait'),
+                ('root/wait', 'perform')} <= spans
+        assert len([e for e in events if e['ph'] == 'B']) == len(events)/2
+        tids = {e['tid'] for e in events if e['name'] == 'root/test'}
+        assert threading.get_ident() not in tids
+
     @pytest.mark.timeout(10)
     def test_root_perform_complex(self):
         """Test running a simple task.
@@ -241,6 +345,82 @@ class TestTaskExecution(object):
         assert not root.should_stop.is_set()
         assert aux.perform_called == 1
 
+    @pytest.mark.timeout(10)
+    def test_root_perform_parallel_bounded_pool(self):
+        """Test running parallel tasks in a pool limited to a single thread.
+
+        """
+        names = set()
+
+        def record_thread(task, value):
+            names.add(threading.current_thread().name)
+
+        root = self.root
+        root.pool_sizes = {'test': 1}
+        for i in range(3):
+            par = CheckTask(name='test%d' % i, custom=record_thread)
+            par.parallel = {'activated': True, 'pool': 'test'}
+            root.add_child_task(i, par)
+        root.perform()
+
+        assert not root.should_stop.is_set()
+        assert len(names) == 1
+        assert names.pop().startswith('exopy-pool-test')
+
+    @pytest.mark.timeout(10)
+    def test_root_perform_parallel_nested_bounded_pool(self):
+        """Test dispatching to a saturated pool from one of its threads.
+
+        """
+        root = self.root
+        root.pool_sizes = {'test': 1}
+        loop = LoopTask(name='loop',
+                        parallel={'activated': True, 'pool': 'test'})
+        loop.interface = IterableLoopInterface(iterable='range(3)')
+        par = CheckTask(name='test',
+                        parallel={'activated': True, 'pool': 'test'})
+        loop.add_child_task(0, par)
+        root.add_child_task(0, loop)
+        root.perform()
+
+        assert not root.should_stop.is_set()
+        assert par.perform_called == 3
+
+    @pytest.mark.timeout(60)
+    def test_root_perform_parallel_process(self):
+        """Test running a task in a worker process.
+
+        """
+        root = self.root
+        root.write_in_database('val', 2)
+        formulas = OrderedDict([('pid', '__import__("os").getpid()'),
+                                ('value', '{val}**2')])
+        formula = FormulaTask(name='formula', formulas=formulas)
+        formula.parallel = {'activated': True, 'pool': 'test',
+                            'process': True}
+        root.add_child_task(0, formula)
+        # The default wait of the formula ensures the first one is done.
+        formulas = OrderedDict([('value', '{formula_value} + 1')])
+        root.add_child_task(1, FormulaTask(name='after', formulas=formulas))
+        root.perform()
+
+        assert not root.should_stop.is_set()
+        assert root.get_from_database('formula_value') == 4
+        assert root.get_from_database('formula_pid') != os.getpid()
+        assert root.get_from_database('after_value') == 5
+
+    def test_check_complex_task_in_process(self):
+        """Test that complex tasks cannot be executed in a worker process.
+
+        """
+        comp = ComplexTask(name='comp', parallel={'activated': True,
+                                                  'pool': 'test',
+                                                  'process': True})
+        self.root.add_child_task(0, comp)
+        test, traceback = comp.check()
+        assert not test
+        assert 'root/comp-parallel' in traceback
+
     @pytest.mark.timeout(10)
     def test_root_perform_parallel_in_finalization(self):
         """Ensure that the ThreadResources release does not prevent to start
@@ -586,19 +766,102 @@ class TestTaskExecution(object):
         assert not par2.perform_called
         assert not par3.perform_called
 
+    @pytest.mark.timeout(10)
+    def test_pause_nested_bounded_pool(self):
+        """Test pausing while running work dispatched inline to a pool.
+
+        """
+        root = self.root
+        root.pool_sizes = {'test': 1}
+
+        def pause(task, value):
+            task.root.should_pause.set()
+
+        def wait_for_pause(task, value):
+            task.root.should_pause.wait()
+
+        loop = LoopTask(name='loop',
+                        parallel={'activated': True, 'pool': 'test'})
+        loop.interface = IterableLoopInterface(iterable='range(1)')
+        comp = ComplexTask(name='comp',
+                           parallel={'activated': True, 'pool': 'test'})
+        comp.add_child_task(0, CheckTask(name='pause', custom=pause))
+        inner = CheckTask(name='inner')
+        comp.add_child_task(1, inner)
+        loop.add_child_task(0, comp)
+        root.add_child_task(0, loop)
+        # Not stoppable so that the main thread pauses only in the last task.
+        root.add_child_task(1, CheckTask(name='wait', custom=wait_for_pause,
+                                         stoppable=False))
+        last = CheckTask(name='last')
+        root.add_child_task(2, last)
+
+        t = threading.Thread(target=root.perform)
+        t.start()
+        # Both the main thread and the pool thread (about to run the inner
+        # task inline) are paused.
+        try:
+            assert root.paused.wait(5)
+            assert root.active_threads_counter.count == 2
+        finally:
+            root.should_pause.clear()
+            t.join()
+
+        assert not root.should_stop.is_set()
+        assert inner.perform_called == 1
+        assert last.perform_called == 1
+
+    @pytest.mark.timeout(10)
+    def test_pause_with_resume_event(self, exopy_qtbot):
+        """Test pausing and resuming the execution using the resume event.
+
+        """
+        def pause(task, value):
+            """Post a method resuming execution on event loop and pause.
+
+            """
+            def resume(t):
+                t.root.should_pause.clear()
+                t.root.should_resume.set()
+            deferred_call(resume, task)
+            task.root.should_pause.set()
+
+        root = self.root
+        root.should_resume = Event()
+        par = CheckTask(name='test', custom=pause)
+        comp = ComplexTask(name='comp', stoppable=False,
+                           parallel={'activated': True, 'pool': 'test'})
+        par2 = CheckTask(name='test2')
+        comp.add_child_task(0, par2)
+        par3 = CheckTask(name='test3')
+        for i, c in enumerate([par, comp, par3]):
+            root.add_child_task(i, c)
+
+        t = threading.Thread(target=root.perform)
+        t.start()
+        sleep(0.1)
+        exopy_qtbot.wait(10)
+        t.join()
+
+        assert not root.should_stop.is_set()
+        assert par2.perform_called == 1
+        assert par3.perform_called == 1
+        assert root.resumed.is_set()
+        del root.should_resume
+
     def test_handle_finalisation_issues(self):
         """Test the handling of issues in cleaning ressources in root.
 
         """
         release_order = []
 
-        class FalseThreadDispatcher(object):
-            """False thread which cannot be joined.
+        class FalseExecutor(object):
+            """False executor which cannot be shut down.
 
             """
             called = 0
 
-            def stop(self):
+            def shutdown(self):
                 release_order.append(self)
                 self.called += 1
                 raise Exception()
@@ -634,8 +897,8 @@ class TestTaskExecution(object):
                 raise Exception()
 
         root = self.root
-        thread = FalseThreadDispatcher()
-        root.resources['threads']['test'] = [thread]
+        thread = FalseExecutor()
+        root.resources['threads']['test'] = thread
         instr = FalseInstr()
         root.resources['instrs']['a'] = instr, FalseStarter()
         stream = FalseFile()
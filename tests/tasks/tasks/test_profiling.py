@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+# -----------------------------------------------------------------------------
+# Copyright 2015-2018 by Exopy Authors, see AUTHORS for more details.
+#
+# Distributed under the terms of the BSD license.
+#
+# The full license is in the file LICENCE, distributed with this software.
+# -----------------------------------------------------------------------------
+"""Test the instrumentation of the execution of the tasks.
+
+"""
+import json
+from threading import Thread
+from time import perf_counter
+
+import pytest
+
+from exopy.tasks.tasks.profiling import (TaskTimings, TimingsRecorder,
+                                         TraceRecorder, SamplingProfiler,
+                                         make_timed, make_traced)
+
+
+def test_task_timings():
+    """Test accumulating statistics about the execution of a task.
+
+    """
+    timings = TaskTimings()
+    assert timings.summary() == {'count': 0}
+    assert timings.percentile(50) == 0.0
+
+    for i in range(1, 101):
+        timings.record(i*1e-3)
+    timings.record(0)
+
+    summary = timings.summary()
+    assert summary['count'] == 101
+    assert summary['total'] == pytest.approx(5.05)
+    assert summary['min'] == 0
+    assert summary['max'] == 0.1
+    # Estimates are exact up to the width of a bin (about 12 %).
+    assert summary['p50'] == pytest.approx(0.05, rel=0.15)
+    assert summary['p90'] == pytest.approx(0.09, rel=0.15)
+    assert summary['p99'] <= 0.1
+
+    timings.record(1e6)
+    assert timings.percentile(100) == 1e6
+
+
+def test_timings_recorder(tmpdir):
+    """Test collecting the statistics of several tasks.
+
+    """
+    recorder = TimingsRecorder()
+    timings = recorder.get_timings('root/a')
+    assert recorder.get_timings('root/a') is timings
+    recorder.get_timings('root/b')
+
+    def perform(task, value):
+        if value is None:
+            raise ValueError()
+        return value
+
+    timed = make_timed(perform, timings)
+    assert timed.__name__ == 'perform'
+    assert timed(None, 1) == 1
+    with pytest.raises(ValueError):
+        timed(None, None)
+
+    report = recorder.report()
+    assert report['root/a']['count'] == 2
+    assert report['root/b'] == {'count': 0}
+
+    path = str(tmpdir.join('test.csv'))
+    recorder.save(path)
+    with open(path) as f:
+        lines = f.readlines()
+    assert lines[0].strip() == 'task,count,total,mean,min,max,p50,p90,p99'
+    assert lines[1].startswith('root/a,2,')
+    assert lines[2].strip() == 'root/b,0,,,,,,,'
+
+
+def test_trace_recorder(tmpdir):
+    """Test recording spans and saving them in the trace event format.
+
+    """
+    tracer = TraceRecorder()
+
+    def perform(task):
+        with tracer.span('inner', 'wait'):
+            pass
+
+    traced = make_traced(perform, tracer, 'root/a', 'perform')
+    assert traced.__name__ == 'perform'
+    traced(None)
+
+    path = str(tmpdir.join('test.json'))
+    tracer.save(path)
+    with open(path) as f:
+        events = json.load(f)['traceEvents']
+
+    assert [(e['name'], e['cat'], e['ph']) for e in events] == \
+        [('root/a', 'perform', 'B'), ('inner', 'wait', 'B'),
+         ('inner', 'wait', 'E'), ('root/a', 'perform', 'E')]
+    assert events[0]['ts'] == 0
+    assert all(e['ts'] >= 0 for e in events)
+    assert len({e['tid'] for e in events}) == 1
+
+
+def busy_loop(duration):
+    """Keep a thread busy for the specified duration.
+
+    """
+    stop = perf_counter() + duration
+    while perf_counter() < stop:
+        pass
+
+
+@pytest.mark.timeout(10)
+def test_sampling_profiler(tmpdir):
+    """Test sampling the stacks of a worker thread.
+
+    """
+    profiler = SamplingProfiler(rate=500)
+    profiler.start()
+    thread = Thread(target=busy_loop, args=(0.2,))
+    thread.start()
+    thread.join()
+    profiler.stop()
+
+    stacks = [s for s in profiler.stacks if 'busy_loop' in s]
+    assert stacks
+    assert all(s.index('run') < s.index('busy_loop') for s in stacks)
+    assert not any('_sample' in s for s in profiler.stacks)
+
+    path = str(tmpdir.join('test.folded'))
+    profiler.save(path)
+    with open(path) as f:
+        lines = f.readlines()
+    assert len(lines) == len(profiler.stacks)
+    stack, count = lines[0].rsplit(' ', 1)
+    assert profiler.stacks[stack] == int(count)
@@ -12,7 +12,12 @@ Given how messy it is to properly test thread-safety I don't try and just
 check that in single thread things work.
 
 """
-from exopy.tasks.tasks.shared_resources import SharedCounter, SharedDict
+import sys
+from threading import Thread
+
+from exopy.tasks.tasks.shared_resources import (SharedCounter, SharedDict,
+                                                ThreadPoolResource,
+                                                ActivePoolsResource)
 
 
 def test_shared_counter():
@@ -51,3 +56,50 @@ def test_shared_dict():
 
     for i in sdict:
         pass
+
+
+def test_thread_pool_resource():
+    """Test creating and releasing the executors of the pools.
+
+    """
+    pools = ThreadPoolResource(pool_sizes={'small': 1})
+    small = pools.get_executor('small')
+    assert small._max_workers == 1
+    assert pools.get_executor('small') is small
+    assert pools.get_executor('other')._max_workers == sys.maxsize
+
+    # Only the threads of bounded pools are marked.
+    assert small.submit(pools.in_bounded_pool, 'small').result()
+    assert not small.submit(pools.in_bounded_pool, 'other').result()
+    assert not pools.get_executor('other').submit(pools.in_bounded_pool,
+                                                  'other').result()
+    assert not pools.in_bounded_pool('small')
+
+    # Executors created while releasing are released too.
+    small.submit(lambda: pools.get_executor('late').submit(lambda: None))
+    pools.release()
+    assert not len(pools)
+    assert small._shutdown
+
+
+def test_active_pools_resource():
+    """Test waiting on pools to complete their work.
+
+    """
+    active = ActivePoolsResource()
+    active.add('test', 1)
+    active.add('aux', 2)
+    active.wait_for_pools(lambda a: ['other'])
+
+    t = Thread(target=active.wait_for_pools, args=(lambda a: list(a),))
+    t.start()
+    active.remove('test', 1)
+    t.join(0.1)
+    assert t.is_alive()
+    active.remove('aux', 2)
+    t.join(1)
+    assert not t.is_alive()
+
+    active.add('test', 1)
+    active.release()
+    assert not active['test']
@@ -12,9 +12,11 @@
 from math import cos
 
 import numpy
+import pytest
 from numpy.testing import assert_array_equal
 
 from exopy.tasks.tasks.base_tasks import RootTask
+from exopy.tasks.tasks.string_evaluation import fold_constant
 
 
 class TestFormatting(object):
@@ -141,6 +143,32 @@ class TestFormatting(object):
         assert formatted == 'test'
         assert self.root._format_cache
         assert test in self.root._format_cache
+        assert self.root.format_string(test) == 'test'
+
+    def test_formatting_editing_mode_spec(self):
+        """Test formatting values using a format specification.
+
+        """
+        test = 'progress is {val1:03d}/{val2!r:>6}'
+        formatted = self.root.format_string(test)
+        assert formatted == 'progress is 001/  10.0'
+
+    def test_formatting_running_mode_spec(self):
+        """Test formatting values using a format specification and the same
+        entry several times.
+
+        """
+        self.root.database.prepare_to_run()
+        test = '{val1}: {val2:.2f}/{val1:03d}'
+        formatted = self.root.format_string(test)
+        assert formatted == '1: 10.00/001'
+        preformatted, ids = self.root._format_cache[test]
+        assert preformatted == '{0}: {1:.2f}/{0:03d}'
+        assert len(ids) == 2
+
+        self.root.database.set_value('root', 'val1', 2)
+        formatted = self.root.format_string(test)
+        assert formatted == '2: 10.00/002'
 
 
 class TestEvaluation(object):
@@ -253,3 +281,55 @@ class TestEvaluation(object):
         test = 'np.abs({val1})[{val2}]'
         formatted = self.root.format_and_eval_string(test)
         assert formatted == 2.0
+
+    def test_eval_running_mode5(self):
+        """Test eval expression referencing the same entry several times.
+
+        """
+        self.root.database.prepare_to_run()
+        test = '{val1} + {val1}*{val2}'
+        assert self.root.format_and_eval_string(test) == 11.0
+        func, ids = self.root._eval_cache[test]
+        assert len(ids) == 2
+        self.root.database.set_value('root', 'val1', 2)
+        assert self.root.format_and_eval_string(test) == 22.0
+
+    def test_eval_running_mode6(self):
+        """Test eval expression using an entry in a comprehension.
+
+        """
+        self.root.database.prepare_to_run()
+        test = '[{val1}*i for i in range(3)]'
+        assert self.root.format_and_eval_string(test) == [0, 1, 2]
+
+    def test_eval_running_mode7(self):
+        """Test eval expression with no reference to the database.
+
+        """
+        self.root.database.prepare_to_run()
+        test = 'cos(0)'
+        assert self.root.format_and_eval_string(test) == 1.0
+        assert test in self.root._eval_cache
+        assert self.root.format_and_eval_string(test) == 1.0
+
+
+@pytest.mark.parametrize('expr, value',
+                         [('1.0', 1.0), ('2*Pi', 2*cos(0)*numpy.pi),
+                          ('sqrt(4) + max(1, 2)', 4.0), ('(1, -2)', (1, -2)),
+                          ('range(3)', range(3))])
+def test_folding_constants(expr, value):
+    """Test folding expressions which do not depend on the database.
+
+    """
+    func = fold_constant(expr)
+    assert func is not None
+    assert func() == value
+
+
+@pytest.mark.parametrize('expr', ['{val1}', '[1, 2]', 'np.linspace(0, 1, 3)',
+                                  'a', '1/0', 'open("test")', '1 +'])
+def test_not_folding_expressions(expr):
+    """Test that expressions which may not be constant are not folded.
+
+    """
+    assert fold_constant(expr) is None
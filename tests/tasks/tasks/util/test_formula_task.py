@@ -49,10 +49,27 @@ class TestFormulaTask(object):
         self.task.formulas = OrderedDict([('key1', "1.0+3.0"),
                                           ('key2', '3.0+4.0')])
         self.root.prepare()
+        notifications = []
+        self.root.database.observe('notifier', notifications.append)
 
         self.task.perform()
         assert (self.task.get_from_database('Test_key1') == 4.0 and
                 self.task.get_from_database('Test_key2') == 7.0)
+        # Both results are written at once.
+        assert notifications == [[('root/Test_key1', 4.0),
+                                  ('root/Test_key2', 7.0)]]
+
+    def test_perform_dependent_formulas(self):
+        """Test evaluating formulas using the result of a previous one.
+
+        """
+        self.task.formulas = OrderedDict([('key1', "1.0+3.0"),
+                                          ('key2', '{Test_key1}*2')])
+        self.root.prepare()
+        assert not self.task._batch_writes
+
+        self.task.perform()
+        assert self.task.get_from_database('Test_key2') == 8.0
 
     def test_perform_from_load(self):
         """Test checking for correct loading from pref and that we can still
@@ -65,6 +82,9 @@ class TestFormulaTask(object):
                                    ("[(u'key1', '1.0+3.0'), "
                                     "(u'key2', '3.0 + {Test_pi}')]"))
         self.root.prepare()
+        # Only the formula not depending on the database can be folded.
+        assert self.task._eval_cache['1.0+3.0'][1] == []
+        assert '3.0 + {Test_pi}' not in self.task._eval_cache
 
         self.task.perform()
         assert (self.task.get_from_database('Test_key1') == 4.0 and
@@ -72,6 +72,15 @@ class TestSleepTask(object):
         assert len(traceback) == 1
         assert 'root/Test' in traceback
 
+    def test_prepare(self):
+        """Test that a constant time is evaluated when preparing the task.
+
+        """
+        self.task.time = '0.5*2'
+        self.root.prepare()
+        func, ids = self.task._eval_cache['0.5*2']
+        assert not ids and func() == 1.0
+
     def test_perform1(self):
         """Test performing when 'time' is correctly formatted, and
         checking that the time value gets written to the database